@@ -0,0 +1,64 @@
+#! /usr/bin/env python
+"""
+Measure the throughput of the tracked values serializer, in values per second,
+for each available JSON backend::
+
+    ./benchmarks/serializers.py [--values 100000]
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tracking_fields.tests.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.test.utils import override_settings  # noqa: E402
+
+from tracking_fields import serializers  # noqa: E402
+
+VALUES = [
+    "A tracked value",
+    42,
+    3.14,
+    True,
+    None,
+    datetime.datetime(2024, 1, 31, 12, 30, 15),
+    datetime.date(2024, 1, 31),
+    datetime.time(12, 30, 15),
+    uuid.UUID("12345678123456781234567812345678"),
+    ["a", "list", "of", "values"],
+]
+
+
+def benchmark(count):
+    values = (VALUES * (count // len(VALUES) + 1))[:count]
+
+    def run():
+        for value in values:
+            serializers.serialize(value)
+
+    return count / min(timeit.repeat(run, number=1, repeat=5))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--values", type=int, default=100000)
+    args = parser.parse_args()
+    backends = ["json"]
+    if serializers.orjson is not None:
+        backends.append("orjson")
+    for backend in backends:
+        with override_settings(TRACKING_FIELDS_JSON_BACKEND=backend):
+            print("{0}: {1:,.0f} values/s".format(backend, benchmark(args.values)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,22 @@
+import datetime
+import hashlib
+import json
+import operator
+import uuid
+from functools import reduce
 from urllib.parse import quote
 
+import django
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404, QueryDict
 from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext_lazy as _
 
@@ -37,6 +51,18 @@ class TrackedObjectMixinAdmin(admin.ModelAdmin):
         )
 
 
+def _parse_object_value(value):
+    """
+    Get the content type id and object id of a ``<content type id>:<object id>``
+    filter value, None if it is not valid.
+    """
+    try:
+        content_type_id, object_id = value.split(":")
+        return int(content_type_id), int(object_id)
+    except (AttributeError, ValueError):
+        return None
+
+
 class TrackerEventListFilter(admin.SimpleListFilter):
     """Hidden filter used to get history of a particular object."""
 
@@ -45,49 +71,80 @@ class TrackerEventListFilter(admin.SimpleListFilter):
     template = "tracking_fields/admin/filter.html"  # Empty template
 
     def lookups(self, request, model_admin):
-        qs = model_admin.get_queryset(request)
-        objects = qs.values(
-            "object_content_type",
-            "object_id",
-        )
-        lookups = {}
-        for obj in objects:
-            value = "{0}:{1}".format(obj["object_content_type"], obj["object_id"])
-            lookups[value] = value
-        return [(lookup[0], lookup[1]) for lookup in lookups.items()]
+        # Only the requested object is a choice, the filter being hidden
+        if _parse_object_value(self.value()) is None:
+            return []
+        return [(self.value(), self.value())]
 
     def queryset(self, request, queryset):
-        if self.value() is None:
+        value = _parse_object_value(self.value())
+        if value is None:
             return queryset
-        value = self.value().split(":")
         return queryset.filter(object_content_type_id=value[0], object_id=value[1])
 
 
 class TrackerEventUserFilter(admin.SimpleListFilter):
-    """Filter on users."""
+    """
+    Filter on users.
+    The users are fetched with one query by user model. Set
+    ``TRACKING_FIELDS_USER_FILTER_CACHE_TIMEOUT`` to a number of seconds to
+    cache them, by query of the events of the admin.
+    """
 
     title = _("User")
     parameter_name = "user"
+    cache_key = "tracking_fields:user_filter_lookups"
 
     def lookups(self, request, model_admin):
+        timeout = getattr(settings, "TRACKING_FIELDS_USER_FILTER_CACHE_TIMEOUT", None)
         qs = model_admin.get_queryset(request)
-        users = qs.values(
-            "user_content_type",
-            "user_id",
-        ).order_by().distinct()
-        lookups = {}
+        if timeout:
+            cache_key = self.get_cache_key(qs)
+            lookups = cache.get(cache_key)
+            if lookups is not None:
+                return lookups
+        lookups = self._get_lookups(qs)
+        if timeout:
+            cache.set(cache_key, lookups, timeout)
+        return lookups
+
+    def get_cache_key(self, qs):
+        """
+        Get the cache key of the users of the events of ``qs``, which may
+        depend on the request.
+        """
+        sql, params = qs.query.sql_with_params()
+        digest = hashlib.sha256(repr((qs.db, sql, params)).encode()).hexdigest()
+        return "{0}:{1}".format(self.cache_key, digest)
+
+    def _get_lookups(self, qs):
+        users = (
+            qs.values("user_content_type", "user_id")
+            .exclude(user_content_type=None)
+            .order_by()
+            .distinct()
+        )
+        users_by_type = {}
         for user in users:
-            if user["user_content_type"] is None:
-                continue
-            value = "{0}:{1}".format(user["user_content_type"], user["user_id"])
-            try:
-                user_obj = ContentType.objects.get_for_id(
-                    user["user_content_type"]
-                ).get_object_for_this_type(pk=user["user_id"])
-                lookups[value] = getattr(user_obj, "username", str(user_obj))
-            except ObjectDoesNotExist:
-                lookups[value] = f"<id={user['user_id']}>"
-        return [(lookup[0], lookup[1]) for lookup in lookups.items()]
+            users_by_type.setdefault(user["user_content_type"], []).append(
+                user["user_id"]
+            )
+        lookups = []
+        for content_type_id, user_ids in users_by_type.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            user_objs = {}
+            if model is not None:
+                user_objs = model._base_manager.in_bulk(user_ids)
+            for user_id in user_ids:
+                value = "{0}:{1}".format(content_type_id, user_id)
+                user_obj = user_objs.get(user_id)
+                if user_obj is None:
+                    lookups.append((value, f"<id={user_id}>"))
+                else:
+                    lookups.append(
+                        (value, getattr(user_obj, "username", str(user_obj)))
+                    )
+        return lookups
 
     def queryset(self, request, queryset):
         if self.value() is None:
@@ -98,6 +155,59 @@ class TrackerEventUserFilter(admin.SimpleListFilter):
         return queryset
 
 
+class TrackerEventUserSearchFilter(TrackerEventUserFilter):
+    """
+    Filter on users with a search input, without listing them, for large
+    numbers of users. The users are searched on their username, then their
+    events on their content type and id.
+    """
+
+    template = "tracking_fields/admin/user_search_filter.html"
+    # The filters are collapsible ``<details>`` elements since Django 5.0
+    collapsible = django.VERSION >= (5, 0)
+
+    def lookups(self, request, model_admin):
+        return []
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        query_string = changelist.get_query_string(remove=[self.parameter_name])
+        yield {
+            "value": self.value() or "",
+            "params": [
+                (key, value)
+                for key, values in QueryDict(query_string[1:]).lists()
+                for value in values
+            ],
+        }
+
+    def get_user_models(self):
+        """
+        Get the models of the searched users, the user model by default.
+        """
+        return [get_user_model()]
+
+    def queryset(self, request, queryset):
+        if not self.value() or ":" in self.value():
+            return super().queryset(request, queryset)
+        conditions = []
+        for model in self.get_user_models():
+            users = model._base_manager.filter(
+                **{"{0}__icontains".format(model.USERNAME_FIELD): self.value()}
+            )
+            conditions.append(
+                Q(
+                    user_content_type=ContentType.objects.get_for_model(model),
+                    user_id__in=users.values("pk"),
+                )
+            )
+        if not conditions:
+            return queryset.none()
+        return queryset.filter(reduce(operator.or_, conditions))
+
+
 class TrackedFieldModificationAdmin(admin.TabularInline):
     can_delete = False
     model = TrackedFieldModification
@@ -111,6 +221,91 @@ class TrackedFieldModificationAdmin(admin.TabularInline):
         return False
 
 
+def estimate_count(queryset):
+    """
+    Estimate the number of objects of a queryset from the PostgreSQL
+    statistics, without scanning the table. They are counted with other
+    databases.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            # -1 if the table has never been analyzed
+            if row is not None and row[0] >= 0:
+                return int(row[0])
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Change list paginated on the date and id of the events instead of
+    offsets, with an estimated number of events. The pages are only linked
+    to the next one and the first one.
+    """
+
+    cursor_var = "after"
+    keyset_pagination = True
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(self.cursor_var, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # The cursor is only valid for the current filters
+        remove = list(remove or [])
+        if self.cursor_var not in (new_params or {}):
+            remove.append(self.cursor_var)
+        return super().get_query_string(new_params, remove)
+
+    def get_cursor(self, request):
+        value = request.GET.get(self.cursor_var)
+        if value is None:
+            return None
+        try:
+            date, pk = value.split("|")
+            return datetime.datetime.fromisoformat(date), uuid.UUID(pk)
+        except ValueError:
+            raise IncorrectLookupParameters
+
+    def get_results(self, request):
+        cursor = self.get_cursor(request)
+        queryset = self.queryset.order_by("-date", "-pk")
+        if cursor is not None:
+            date, pk = cursor
+            queryset = queryset.filter(Q(date__lt=date) | Q(date=date, pk__lt=pk))
+        result_list = list(queryset[: self.list_per_page + 1])
+        self.next_page_url = None
+        if len(result_list) > self.list_per_page:
+            result_list = result_list[: self.list_per_page]
+            last = result_list[-1]
+            self.next_page_url = self.get_query_string(
+                {self.cursor_var: "{0}|{1}".format(last.date.isoformat(), last.pk)}
+            )
+        self.first_page_url = None
+        if cursor is not None:
+            self.first_page_url = self.get_query_string()
+        self.result_count = estimate_count(self.queryset)
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = self.next_page_url is not None or cursor is not None
+
+
 class TrackingEventAdmin(admin.ModelAdmin):
     date_hierarchy = "date"
     list_display = ("date", "action", "object", "object_repr")
@@ -130,23 +325,51 @@ class TrackingEventAdmin(admin.ModelAdmin):
         "object_repr",
         "user",
         "user_repr",
+        "context",
     )
     inlines = (TrackedFieldModificationAdmin,)
     change_list_template = "tracking_fields/admin/change_list_event.html"
 
+    def get_queryset(self, request):
+        """
+        Get the content types with the events, and their objects with one
+        query by content type.
+        """
+        queryset = super().get_queryset(request)
+        return queryset.select_related(
+            "object_content_type", "user_content_type"
+        ).prefetch_related("object")
+
+    def _keyset_pagination(self):
+        return getattr(settings, "TRACKING_FIELDS_ADMIN_KEYSET_PAGINATION", False)
+
+    def get_changelist(self, request, **kwargs):
+        """
+        Use a keyset pagination if ``TRACKING_FIELDS_ADMIN_KEYSET_PAGINATION``
+        is True, to not count and offset the events.
+        """
+        if self._keyset_pagination():
+            return KeysetChangeList
+        return super().get_changelist(request, **kwargs)
+
+    def get_sortable_by(self, request):
+        if self._keyset_pagination():
+            return ()
+        return super().get_sortable_by(request)
+
     def changelist_view(self, request, extra_context=None):
         """Get object currently tracked and add a button to get back to it"""
         extra_context = extra_context or {}
-        if "object" in request.GET.keys():
-            value = request.GET["object"].split(":")
+        value = _parse_object_value(request.GET.get("object"))
+        if value is not None:
             content_type = get_object_or_404(
                 ContentType,
                 id=value[0],
             )
-            tracked_object = get_object_or_404(
-                content_type.model_class(),
-                id=value[1],
-            )
+            model = content_type.model_class()
+            if model is None:
+                raise Http404
+            tracked_object = get_object_or_404(model, pk=value[1])
             extra_context["tracked_object"] = tracked_object
             extra_context["tracked_object_opts"] = tracked_object._meta
         return super(TrackingEventAdmin, self).changelist_view(request, extra_context)
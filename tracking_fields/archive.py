@@ -0,0 +1,234 @@
+"""
+Archive the old tracking events to gzipped JSON Lines files, one by month,
+and read them back.
+
+Each line is an event with its modifications::
+
+    {"id": "...", "date": "2024-01-31T12:00:00+00:00", "action": "UPDATE",
+     "object_content_type": "app.model", "object_id": 1, "object_repr": "...",
+     "user_content_type": "auth.user", "user_id": 1, "user_repr": "...",
+     "context": {"id": "...", "date": "2024-01-31T12:00:00+00:00",
+                 "correlation_id": "...", "source": "...", "reason": "..."},
+     "fields": [{"id": "...", "field": "name", "old_value": "...",
+                 "new_value": "..."}]}
+"""
+
+from __future__ import unicode_literals
+
+import gzip
+import json
+import os
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.dateparse import parse_datetime
+
+from tracking_fields.models import (
+    TrackedFieldModification,
+    TrackingContext,
+    TrackingEvent,
+)
+from tracking_fields.retention import (
+    delete_events,
+    delete_orphan_contexts,
+    delete_orphan_modifications,
+    drop_partitions,
+    is_partitioned,
+)
+
+
+def _content_type_key(content_type):
+    if content_type is None:
+        return None
+    return "{0}.{1}".format(content_type.app_label, content_type.model)
+
+
+def _serialize_context(context):
+    if context is None:
+        return None
+    return {
+        "id": str(context.pk),
+        "date": context.date.isoformat(),
+        "correlation_id": context.correlation_id,
+        "source": context.source,
+        "reason": context.reason,
+    }
+
+
+def serialize_event(event):
+    """
+    Get the archived representation of an event and its modifications.
+    """
+    return {
+        "id": str(event.pk),
+        "date": event.date.isoformat(),
+        "action": event.action,
+        "object_content_type": _content_type_key(event.object_content_type),
+        "object_id": event.object_id,
+        "object_repr": event.object_repr,
+        "user_content_type": _content_type_key(event.user_content_type),
+        "user_id": event.user_id,
+        "user_repr": event.user_repr,
+        "context": _serialize_context(event.context),
+        "fields": [
+            {
+                "id": str(field.pk),
+                "field": field.field,
+                "old_value": field.old_value,
+                "new_value": field.new_value,
+            }
+            for field in event.fields.all()
+        ],
+    }
+
+
+def get_archive_path(directory, date):
+    return os.path.join(directory, "tracking_events_{0:%Y-%m}.jsonl.gz".format(date))
+
+
+def archive_events(directory, before, batch_size=1000, using=DEFAULT_DB_ALIAS):
+    """
+    Write the events older than ``before`` in the archive of their month in
+    ``directory``. The events are read by batches of ``batch_size`` with their
+    modifications, with a server-side cursor when the database supports it.
+    Events are appended to existing archives.
+
+    :return: The paths of the written archives and the number of events.
+    """
+    events = (
+        TrackingEvent.objects.using(using)
+        .filter(date__lt=before)
+        .select_related("object_content_type", "user_content_type", "context")
+        .prefetch_related("fields")
+        .order_by("date")
+    )
+    paths = []
+    count = 0
+    archive = None
+    try:
+        for event in events.iterator(chunk_size=batch_size):
+            path = get_archive_path(directory, event.date)
+            if not paths or paths[-1] != path:
+                if archive is not None:
+                    archive.close()
+                archive = gzip.open(path, "at", encoding="utf-8")
+                paths.append(path)
+            archive.write(json.dumps(serialize_event(event), ensure_ascii=False))
+            archive.write("\n")
+            count += 1
+    finally:
+        if archive is not None:
+            archive.close()
+    return paths, count
+
+
+def remove_archived_events(
+    before, detach=False, batch_size=1000, using=DEFAULT_DB_ALIAS
+):
+    """
+    Remove the events older than ``before`` once archived. The partitions
+    entirely older than ``before`` are dropped or detached if the table is
+    partitioned, the other events are deleted in batches. The contexts left
+    without events are then deleted, unless partitions are detached.
+
+    :return: The number of deleted events.
+    """
+    if is_partitioned(using):
+        if drop_partitions(before, detach=detach, using=using) and not detach:
+            if not is_partitioned(using, TrackedFieldModification):
+                delete_orphan_modifications(before, batch_size=batch_size, using=using)
+    deleted = delete_events(before, batch_size=batch_size, using=using)
+    if not (detach and is_partitioned(using)):
+        delete_orphan_contexts(before, batch_size=batch_size, using=using)
+    return deleted
+
+
+def read_archive(path):
+    """
+    Read the events of an archive, one dict at a time.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as archive:
+        for line in archive:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _get_content_type(key, content_types, using):
+    if key is None:
+        return None
+    if key not in content_types:
+        app_label, model = key.split(".")
+        content_types[key] = ContentType.objects.db_manager(using).get_by_natural_key(
+            app_label, model
+        )
+    return content_types[key]
+
+
+def _get_context(data, contexts):
+    # Archives written before the contexts do not have them
+    data = data.get("context")
+    if data is None:
+        return None
+    if data["id"] not in contexts:
+        contexts[data["id"]] = TrackingContext(
+            id=data["id"],
+            date=parse_datetime(data["date"]),
+            correlation_id=data["correlation_id"],
+            source=data["source"],
+            reason=data["reason"],
+        )
+    return contexts[data["id"]]
+
+
+def _restore_batch(events, tracked_fields, using):
+    contexts = {event.context_id: event.context for event in events if event.context}
+    TrackingContext.objects.using(using).bulk_create(
+        contexts.values(), ignore_conflicts=True
+    )
+    TrackingEvent.objects.using(using).bulk_create(events, ignore_conflicts=True)
+    TrackedFieldModification.objects.using(using).bulk_create(
+        tracked_fields, ignore_conflicts=True
+    )
+
+
+def restore_archive(path, batch_size=1000, using=DEFAULT_DB_ALIAS):
+    """
+    Insert the events of an archive back in the database, to investigate
+    them. Events already in the database are skipped.
+
+    :return: The number of read events.
+    """
+    content_types = {}
+    contexts = {}
+    events = []
+    tracked_fields = []
+    count = 0
+    for data in read_archive(path):
+        event = TrackingEvent(
+            id=data["id"],
+            date=parse_datetime(data["date"]),
+            action=data["action"],
+            object_content_type=_get_content_type(
+                data["object_content_type"], content_types, using
+            ),
+            object_id=data["object_id"],
+            object_repr=data["object_repr"],
+            user_content_type=_get_content_type(
+                data["user_content_type"], content_types, using
+            ),
+            user_id=data["user_id"],
+            user_repr=data["user_repr"],
+            context=_get_context(data, contexts),
+        )
+        events.append(event)
+        tracked_fields.extend(
+            TrackedFieldModification(event=event, date=event.date, **field)
+            for field in data["fields"]
+        )
+        count += 1
+        if len(events) >= batch_size:
+            _restore_batch(events, tracked_fields, using)
+            events = []
+            tracked_fields = []
+    _restore_batch(events, tracked_fields, using)
+    return count
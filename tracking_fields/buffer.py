@@ -0,0 +1,257 @@
+"""
+Buffer the tracking events created during a transaction to write them in
+batches, either when the transaction is committed
+(``TRACKING_FIELDS_DEFER_WRITES`` setting) or at the end of a
+``defer_tracking`` block.
+
+Until the transaction is committed, the events are buffered with
+``transaction.on_commit``, which discards them if their savepoint is rolled
+back. Committed events are gathered and written by the callback of the last
+events of the transaction known to be committed with them: the events of the
+same savepoint or of one of its parents buffered later. Otherwise, e.g. for
+the events of sibling savepoints without later events in their parent, they
+are written by their own callback.
+
+With the ``TRACKING_FIELDS_COALESCE_UPDATES`` setting, the events are also
+buffered until the transaction is committed, and the UPDATE events of the
+same object written together are merged into one.
+"""
+
+from __future__ import unicode_literals
+
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from tracking_fields.models import UPDATE
+from tracking_fields.writer import write_events
+
+_local = Local()
+
+
+class TrackingBuffer:
+    """
+    Events and TrackedFieldModification buffered in a savepoint of a
+    transaction, and written on commit.
+    """
+
+    def __init__(self, state, savepoints, events, tracked_fields):
+        self.state = state
+        self.savepoints = savepoints
+        self.events = events
+        self.tracked_fields = tracked_fields
+        # Set when the callback of a later buffer is called whenever this
+        # one is, to write both
+        self.deferred = False
+
+    def commit(self):
+        """
+        Called on commit, unless the savepoint of the buffer is rolled back.
+        """
+        state = self.state
+        # No buffer registered before the commit will be deferred anymore
+        state.buffers = []
+        state.events.extend(self.events)
+        state.tracked_fields.extend(self.tracked_fields)
+        if not self.deferred:
+            events, tracked_fields = state.events, state.tracked_fields
+            state.events, state.tracked_fields = [], []
+            _write(events, tracked_fields, state.using)
+
+
+def coalesce_events(events, tracked_fields):
+    """
+    Merge the UPDATE events of the same object, user and context into the
+    last one, with the first old value and the last new value of each field.
+    Fields set back to their old value are dropped, and so are the merged
+    events left without fields. Objects without integer primary key can not
+    be told apart and are not merged.
+
+    :return: The remaining events and their TrackedFieldModification.
+    """
+    groups = {}
+    for event in events:
+        if event.action == UPDATE and event.object_id is not None:
+            key = (
+                event.object_content_type_id,
+                event.object_id,
+                event.user_content_type_id,
+                event.user_id,
+                event.context_id,
+            )
+            groups.setdefault(key, []).append(event)
+    fields_by_event = {}
+    for tracked_field in tracked_fields:
+        fields_by_event.setdefault(tracked_field.event_id, []).append(tracked_field)
+    dropped = set()
+    for group in groups.values():
+        if len(group) == 1:
+            continue
+        modifications = {}
+        for event in group:
+            for tracked_field in fields_by_event.pop(event.pk, ()):
+                first = modifications.setdefault(tracked_field.field, tracked_field)
+                first.new_value = tracked_field.new_value
+        last = group[-1]
+        fields = []
+        for modification in modifications.values():
+            if modification.old_value != modification.new_value:
+                modification.event = last
+                modification.date = last.date
+                fields.append(modification)
+        fields_by_event[last.pk] = fields
+        dropped.update(event.pk for event in group[:-1])
+        if not fields:
+            dropped.add(last.pk)
+    events = [event for event in events if event.pk not in dropped]
+    tracked_fields = [
+        tracked_field
+        for event in events
+        for tracked_field in fields_by_event.get(event.pk, ())
+    ]
+    return events, tracked_fields
+
+
+def _defer_writes():
+    # Updates can only be merged once the transaction is over
+    return getattr(settings, "TRACKING_FIELDS_DEFER_WRITES", False) or getattr(
+        settings, "TRACKING_FIELDS_COALESCE_UPDATES", False
+    )
+
+
+def _write(events, tracked_fields, using):
+    if getattr(settings, "TRACKING_FIELDS_COALESCE_UPDATES", False):
+        events, tracked_fields = coalesce_events(events, tracked_fields)
+    write_events(events, tracked_fields, using)
+
+
+def _get_savepoints(connection):
+    # Atomic blocks without savepoint are rolled back with their parent
+    return tuple(sid for sid in connection.savepoint_ids if sid is not None)
+
+
+class _Block:
+    """
+    Events buffered at the level of a ``defer_tracking`` block.
+    """
+
+    def __init__(self, savepoints):
+        self.savepoints = savepoints
+        self.events = []
+        self.tracked_fields = []
+
+
+class _BufferState:
+    """
+    Buffers of a database connection.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        # Buffers which may still be deferred to a later one
+        self.buffers = []
+        # Events of the committed buffers, until written
+        self.events = []
+        self.tracked_fields = []
+        # Active ``defer_tracking`` blocks, the innermost last
+        self.blocks = []
+
+
+def _get_state(using):
+    states = getattr(_local, "states", None)
+    if states is None:
+        states = _local.states = {}
+    if using not in states:
+        states[using] = _BufferState(using)
+    return states[using]
+
+
+def _add_buffer(state, savepoints, events, tracked_fields):
+    """
+    Buffer events until the transaction is committed. The previous buffers
+    of the savepoint or of its children are committed with the new one, so
+    they are deferred to it.
+    """
+    buffers = state.buffers
+    while buffers and buffers[-1].savepoints[: len(savepoints)] == savepoints:
+        buffers.pop().deferred = True
+    buffer = TrackingBuffer(state, savepoints, events, tracked_fields)
+    buffers.append(buffer)
+    transaction.on_commit(buffer.commit, using=state.using)
+
+
+def buffer_events(events, tracked_fields, using):
+    """
+    Buffer events until the end of the transaction or of the current
+    ``defer_tracking`` block if needed. Events of the savepoints created in
+    a ``defer_tracking`` block are only buffered until the end of the
+    transaction, with the settings deferring the writes.
+
+    :param using: The database alias on which the tracked changes are made.
+    :return: True if the events are buffered, False if they must be written
+        right away.
+    """
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        return False
+    state = _get_state(using)
+    savepoints = _get_savepoints(connection)
+    if state.blocks and state.blocks[-1].savepoints == savepoints:
+        block = state.blocks[-1]
+        block.events.extend(events)
+        block.tracked_fields.extend(tracked_fields)
+        return True
+    if not _defer_writes():
+        return False
+    _add_buffer(state, savepoints, list(events), list(tracked_fields))
+    return True
+
+
+def flush_events(using=None):
+    """
+    Write the events buffered by the current ``defer_tracking`` blocks
+    without waiting for the end of the blocks.
+    """
+    using = using or DEFAULT_DB_ALIAS
+    events = []
+    tracked_fields = []
+    for block in _get_state(using).blocks:
+        events.extend(block.events)
+        tracked_fields.extend(block.tracked_fields)
+        block.events = []
+        block.tracked_fields = []
+    _write(events, tracked_fields, using)
+
+
+@contextmanager
+def defer_tracking(using=None):
+    """
+    Buffer the tracking events created in the block and write them in one
+    batch at the end of the block, just before the transaction is committed.
+    The block is run in a transaction, so if the events can not be written,
+    the tracked changes are rolled back too. This does not apply with the
+    background writer, which only gets the events once the transaction is
+    committed.
+
+    The events of the savepoints created in the block are written right
+    away, or on commit with ``TRACKING_FIELDS_DEFER_WRITES``, as a savepoint
+    may be rolled back without the block.
+
+    :Example:
+    >>> with defer_tracking():
+    ...     for human in Human.objects.all():
+    ...         human.age += 1
+    ...         human.save()
+    """
+    using = using or DEFAULT_DB_ALIAS
+    with transaction.atomic(using=using):
+        state = _get_state(using)
+        block = _Block(_get_savepoints(connections[using]))
+        state.blocks.append(block)
+        try:
+            yield
+        finally:
+            state.blocks.pop()
+        _write(block.events, block.tracked_fields, using)
@@ -0,0 +1,85 @@
+"""
+Attach the tracking events to a context describing why they happen.
+
+The context of a request, job or batch is written once in a
+``TrackingContext``, referenced by all of its events::
+
+    from tracking_fields.context import tracking_context
+
+    with tracking_context(source="import", reason="Nightly import"):
+        import_products()
+
+    @tracking_context(source="cleanup")
+    def cleanup():
+        ...
+
+Like ``CuserMiddleware``, the current context is kept in a context variable.
+"""
+
+from __future__ import unicode_literals
+
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from tracking_fields.models import TrackingContext
+
+_context = ContextVar("tracking_fields_context", default=None)
+
+
+def get_tracking_context():
+    """
+    Get the current ``TrackingContext``, None outside of ``tracking_context``.
+    """
+    return _context.get()
+
+
+class tracking_context:
+    """
+    Context manager and decorator attaching the events to a new
+    ``TrackingContext``. A decorated function gets a new context on each call.
+    Nested contexts replace the outer ones until they exit.
+
+    :param correlation_id: Id of the request or job, e.g. to find its logs.
+    :param source: What makes the changes, e.g. the name of a task.
+    :param reason: Why the changes are made.
+    """
+
+    def __init__(self, correlation_id="", source="", reason=""):
+        self.correlation_id = correlation_id
+        self.source = source
+        self.reason = reason
+        self._tokens = []
+
+    def __enter__(self):
+        context = TrackingContext(
+            correlation_id=str(self.correlation_id),
+            source=self.source,
+            reason=self.reason,
+        )
+        self._tokens.append(_context.set(context))
+        return context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _context.reset(self._tokens.pop())
+
+    def _copy(self):
+        return self.__class__(self.correlation_id, self.source, self.reason)
+
+    def __call__(self, func):
+        if iscoroutinefunction(func):
+
+            @wraps(func)
+            async def inner(*args, **kwargs):
+                with self._copy():
+                    return await func(*args, **kwargs)
+
+        else:
+
+            @wraps(func)
+            def inner(*args, **kwargs):
+                with self._copy():
+                    return func(*args, **kwargs)
+
+        return inner
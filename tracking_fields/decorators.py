@@ -1,26 +1,142 @@
 from __future__ import unicode_literals
 
+from collections import namedtuple
+from functools import partial
+from inspect import getattr_static
+from types import MappingProxyType
+
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import ManyToManyField
+from django.db.models.fields.related import ForeignKey, lazy_related_operation
 from django.db.models.signals import m2m_changed, post_init, post_save, pre_delete
 from django.urls import reverse
 
 from tracking_fields.tracking import (
+    TrackedFieldDescriptor,
     tracking_delete,
     tracking_init,
     tracking_m2m,
     tracking_save,
 )
 
+# Everything the tracking callbacks need to know about a model, computed once
+# when the model is decorated so the callbacks never have to introspect
+# ``_meta`` again:
+# - fields: ``(name, attname)`` of the tracked non m2m fields
+# - m2m_fields: names of the tracked m2m fields
+# - related_fields: ``(name, attname, related)`` of the non m2m fields tracked
+#   from related models, ``related`` being the tuple of
+#   ``(field on related model, accessor to related model)``
+# - related_m2m_fields: m2m field name to ``related`` for the m2m fields
+#   tracked from related models
+# - snapshot_fields: ``(name, attname)`` of the fields to store on init
+# - fk_fields: foreign key field name to the related model, set once the
+#   related model is defined
+# - through_fields: m2m through model to the m2m field name
+# - lazy: whether original values are stored on first write instead of on init
+TrackingPlan = namedtuple(
+    "TrackingPlan",
+    [
+        "fields",
+        "m2m_fields",
+        "related_fields",
+        "related_m2m_fields",
+        "snapshot_fields",
+        "fk_fields",
+        "through_fields",
+        "lazy",
+    ],
+)
+
+
+def _set_fk_model(fk_fields, name, _cls, related_model):
+    fk_fields[name] = related_model
+
+
+def _build_tracking_plan(cls):
+    """Build the TrackingPlan of a model from its tracked fields."""
+    fields = []
+    m2m_fields = []
+    related_fields = []
+    related_m2m_fields = {}
+    fk_fields = {}
+    through_fields = {}
+
+    def _add_field(name):
+        field_obj = cls._meta.get_field(name)
+        if isinstance(field_obj, ManyToManyField):
+            through_fields.setdefault(field_obj.remote_field.through, name)
+            return None
+        if isinstance(field_obj, ForeignKey):
+            # The related model may not be defined yet (``ForeignKey("Model")``)
+            lazy_related_operation(
+                partial(_set_fk_model, fk_fields, name),
+                cls,
+                field_obj.remote_field.model,
+            )
+            return field_obj.attname
+        return name
+
+    for name in getattr(cls, "_tracked_fields", []):
+        attname = _add_field(name)
+        if attname is None:
+            m2m_fields.append(name)
+        else:
+            fields.append((name, attname))
+    for name, related in getattr(cls, "_tracked_related_fields", {}).items():
+        attname = _add_field(name)
+        if attname is None:
+            related_m2m_fields[name] = tuple(related)
+        else:
+            related_fields.append((name, attname, tuple(related)))
+
+    snapshot_fields = list(fields)
+    for name, attname, _related in related_fields:
+        if (name, attname) not in snapshot_fields:
+            snapshot_fields.append((name, attname))
+
+    return TrackingPlan(
+        fields=tuple(fields),
+        m2m_fields=frozenset(m2m_fields),
+        related_fields=tuple(related_fields),
+        related_m2m_fields=MappingProxyType(related_m2m_fields),
+        snapshot_fields=tuple(snapshot_fields),
+        fk_fields=MappingProxyType(fk_fields),
+        through_fields=MappingProxyType(through_fields),
+        lazy=getattr(cls, "_tracking_lazy", False),
+    )
+
+
+def _add_tracked_descriptors(cls):
+    """
+    Wrap the descriptors of the fields to store so that their original value
+    is stored on first write (lazy tracking).
+    """
+    for field, attname in cls._tracking_plan.snapshot_fields:
+        descriptor = getattr_static(cls, attname)
+        if not isinstance(descriptor, TrackedFieldDescriptor):
+            setattr(cls, attname, TrackedFieldDescriptor(field, attname, descriptor))
+
+
+def _set_tracking_plan(cls):
+    """(Re)build the TrackingPlan of a model."""
+    cls._tracking_plan = _build_tracking_plan(cls)
+    if cls._tracking_plan.lazy:
+        _add_tracked_descriptors(cls)
+        # Connected if the model was tracked from a related model first
+        post_init.disconnect(tracking_init, sender=cls, dispatch_uid=repr(cls))
+
 
 def _add_signals_to_cls(cls):
     # Use repr(cls) to be sure to bound the callback
     # only once for each class
-    post_init.connect(
-        tracking_init,
-        sender=cls,
-        dispatch_uid=repr(cls),
-    )
+    if not getattr(cls, "_tracking_lazy", False):
+        # Lazy tracked models store their original values on first write
+        post_init.connect(
+            tracking_init,
+            sender=cls,
+            dispatch_uid=repr(cls),
+        )
     post_save.connect(
         tracking_save,
         sender=cls,
@@ -60,6 +176,7 @@ def _track_class_related_field(cls, field):
     # }
 
     related_cls._tracked_related_fields[related_field].append((field, related_name))
+    _set_tracking_plan(related_cls)
     _add_signals_to_cls(related_cls)
     # Detect m2m fields changes
     if isinstance(related_cls._meta.get_field(related_field), ManyToManyField):
@@ -86,11 +203,13 @@ def _track_class_field(cls, field):
         )
 
 
-def _track_class(cls, fields):
+def _track_class(cls, fields, lazy=False):
     """Track fields on the specified model"""
     # Small tests to ensure everything is all right
     assert not getattr(cls, "_is_tracked", False)
 
+    cls._tracking_lazy = lazy
+
     for field in fields:
         _track_class_field(cls, field)
 
@@ -101,6 +220,7 @@ def _track_class(cls, fields):
     # Do not directly track related fields (tracked on related model)
     # or m2m fields (tracked by another signal)
     cls._tracked_fields = [field for field in fields if "__" not in field]
+    _set_tracking_plan(cls)
 
 
 def _add_get_tracking_url(cls):
@@ -118,10 +238,14 @@ def _add_get_tracking_url(cls):
         setattr(cls, "get_tracking_url", get_tracking_url)
 
 
-def track(*fields):
+def track(*fields, lazy=False):
     """
     Decorator used to track changes on Model's fields.
 
+    :param lazy: Store the original value of a field the first time it is
+        modified instead of storing all of them when the object is loaded.
+        Objects which are only read then cost nothing to track.
+
     :Example:
     >>> @track('name')
     ... class Human(models.Model):
@@ -129,7 +253,7 @@ def track(*fields):
     """
 
     def inner(cls):
-        _track_class(cls, fields)
+        _track_class(cls, fields, lazy=lazy)
         _add_get_tracking_url(cls)
         return cls
 
@@ -0,0 +1,80 @@
+"""
+Rebuild the history of the tracked objects from their events.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import uuid
+
+from django.core.exceptions import ObjectDoesNotExist
+
+from tracking_fields.models import TrackedFieldModification
+
+
+def _get_current_m2m_pks(obj, field):
+    """
+    Get the primary keys of the objects currently related to ``obj`` through
+    ``field``, which can be a m2m field of a related object (``related__m2m``).
+    """
+    *related_fields, field = field.split("__")
+    try:
+        for related_field in related_fields:
+            obj = getattr(obj, related_field)
+    except ObjectDoesNotExist:
+        return set()
+    if obj is None:
+        return set()
+    return {
+        str(pk) if isinstance(pk, uuid.UUID) else pk
+        for pk in getattr(obj, field).values_list("pk", flat=True)
+    }
+
+
+def get_m2m_values(modification):
+    """
+    Get the related objects before and after a m2m modification.
+
+    Modifications stored with ``TRACKING_FIELDS_M2M_FORMAT = "compact"`` only
+    contain the added and removed primary keys. The full sets of primary keys
+    are rebuilt from the current related objects, undoing every later
+    modification of the field.
+
+    :param modification: A ``TrackedFieldModification`` of a m2m field.
+    :return: The lists of representations of the related objects before and
+        after the modification for the full format, of primary keys for the
+        compact format.
+    :raises ValueError: If the tracked object has been deleted, or if a later
+        modification of the field is not in the compact format.
+    """
+    old_value = json.loads(modification.old_value)
+    new_value = json.loads(modification.new_value)
+    if not isinstance(new_value, dict):
+        return old_value, new_value
+    event = modification.event
+    if event.object is None:
+        raise ValueError("The tracked object has been deleted.")
+    current = _get_current_m2m_pks(event.object, modification.field)
+    later_modifications = (
+        TrackedFieldModification.objects.filter(
+            event__object_content_type_id=event.object_content_type_id,
+            event__object_id=event.object_id,
+            event__date__gt=event.date,
+            field=modification.field,
+        )
+        .order_by("-event__date")
+        .values_list("old_value", "new_value")
+    )
+    for later_old_value, later_new_value in later_modifications.iterator():
+        later_old_value = json.loads(later_old_value)
+        later_new_value = json.loads(later_new_value)
+        if not isinstance(later_new_value, dict):
+            raise ValueError(
+                "Modification of {0} not in the compact format.".format(
+                    modification.field
+                )
+            )
+        current -= set(later_new_value["added"])
+        current |= set(later_old_value["removed"])
+    before = (current - set(new_value["added"])) | set(old_value["removed"])
+    return sorted(before, key=str), sorted(current, key=str)
@@ -0,0 +1,62 @@
+import datetime
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from tracking_fields.archive import archive_events, remove_archived_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive the tracking events older than a number of days to gzipped "
+        "JSON Lines files, one by month, then remove them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Directory of the archives.")
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "TRACKING_FIELDS_RETENTION_DAYS", None),
+            help="Number of days to keep (default: TRACKING_FIELDS_RETENTION_DAYS).",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the archived events in the database.",
+        )
+        parser.add_argument(
+            "--detach",
+            action="store_true",
+            help="Detach the archived partitions instead of dropping them.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if options["days"] is None:
+            raise CommandError(
+                "Give --days or set the TRACKING_FIELDS_RETENTION_DAYS setting."
+            )
+        if not os.path.isdir(options["directory"]):
+            raise CommandError("{0} is not a directory.".format(options["directory"]))
+        before = timezone.now() - datetime.timedelta(days=options["days"])
+        paths, count = archive_events(
+            options["directory"],
+            before,
+            batch_size=options["batch_size"],
+            using=options["database"],
+        )
+        for path in paths:
+            self.stdout.write(path)
+        self.stdout.write("Archived {0} events".format(count))
+        if not options["keep"]:
+            remove_archived_events(
+                before,
+                detach=options["detach"],
+                batch_size=options["batch_size"],
+                using=options["database"],
+            )
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from tracking_fields.models import TrackedFieldModification
+from tracking_fields.writer import set_json_values
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the JSON values of the tracked field modifications written "
+        "before the TRACKING_FIELDS_JSON_VALUES setting was enabled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        modifications = (
+            TrackedFieldModification.objects.using(using)
+            .filter(old_value_json__isnull=True, new_value_json__isnull=True)
+            .only("pk", "old_value", "new_value")
+            .order_by("pk")
+        )
+        converted = 0
+        last_pk = None
+        while True:
+            batch = modifications
+            if last_pk is not None:
+                # Values serialized as null stay null, do not get them again
+                batch = batch.filter(pk__gt=last_pk)
+            batch = list(batch[: options["batch_size"]])
+            if not batch:
+                break
+            set_json_values(batch)
+            with transaction.atomic(using=using):
+                TrackedFieldModification.objects.using(using).bulk_update(
+                    batch, ["old_value_json", "new_value_json"]
+                )
+            converted += len(batch)
+            last_pk = batch[-1].pk
+        self.stdout.write("Converted {0} modifications".format(converted))
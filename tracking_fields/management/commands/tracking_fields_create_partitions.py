@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from tracking_fields.retention import create_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly partitions of the tracking events of the current "
+        "month and of the next ones (PostgreSQL only)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months",
+            type=int,
+            default=3,
+            help="Number of partitions to create after the current month.",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        try:
+            names = create_partitions(options["months"], using=options["database"])
+        except ValueError as e:
+            raise CommandError(e)
+        for name in names:
+            self.stdout.write(name)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from tracking_fields.archive import restore_archive
+
+
+class Command(BaseCommand):
+    help = "Insert the tracking events of archives back in the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Archives to restore.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        for path in options["paths"]:
+            count = restore_archive(
+                path, batch_size=options["batch_size"], using=options["database"]
+            )
+            self.stdout.write("Restored {0} events from {1}".format(count, path))
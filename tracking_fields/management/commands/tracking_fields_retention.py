@@ -0,0 +1,54 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from tracking_fields.retention import apply_retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove the tracking events older than a number of days, by dropping "
+        "their partitions if the table is partitioned, or by deleting them in "
+        "batches otherwise."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "TRACKING_FIELDS_RETENTION_DAYS", None),
+            help="Number of days to keep (default: TRACKING_FIELDS_RETENTION_DAYS).",
+        )
+        parser.add_argument(
+            "--detach",
+            action="store_true",
+            help="Detach the old partitions instead of dropping them.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if options["days"] is None:
+            raise CommandError(
+                "Give --days or set the TRACKING_FIELDS_RETENTION_DAYS setting."
+            )
+        before = timezone.now() - datetime.timedelta(days=options["days"])
+        partitions, events, modifications = apply_retention(
+            before,
+            detach=options["detach"],
+            batch_size=options["batch_size"],
+            using=options["database"],
+        )
+        for name in partitions:
+            self.stdout.write(
+                "{0} partition {1}".format(
+                    "Detached" if options["detach"] else "Dropped", name
+                )
+            )
+        if events:
+            self.stdout.write("Deleted {0} events".format(events))
+        if modifications:
+            self.stdout.write("Deleted {0} modifications".format(modifications))
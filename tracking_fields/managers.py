@@ -0,0 +1,112 @@
+from __future__ import unicode_literals
+
+from django.db import models, transaction
+
+from tracking_fields.buffer import defer_tracking
+from tracking_fields.tracking import (
+    get_tracked_values,
+    tracking_bulk_create,
+    tracking_bulk_update,
+    tracking_update,
+)
+
+
+class TrackingQuerySet(models.QuerySet):
+    """
+    QuerySet tracking the changes made in bulk, which do not send any signal.
+
+    :Example:
+    >>> @track('name')
+    ... class Human(models.Model):
+    ...     name = models.CharField(max_length=30)
+    ...     objects = TrackingManager()
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tracking_disabled = False
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._tracking_disabled = self._tracking_disabled
+        return clone
+
+    def _get_tracked_fields(self, fields):
+        """
+        Get the names of the tracked fields in ``fields``.
+        """
+        plan = getattr(self.model, "_tracking_plan", None)
+        if plan is None or self._tracking_disabled:
+            return []
+        tracked_fields = {field for field, _attname in plan.snapshot_fields}
+        names = [self.model._meta.get_field(field).name for field in fields]
+        return [name for name in names if name in tracked_fields]
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Create the objects and a CREATE event for each created object.
+        Objects whose primary key is not set by the database (e.g. with
+        ``ignore_conflicts``) are not tracked.
+        """
+        if getattr(self.model, "_tracking_plan", None) is None:
+            return super().bulk_create(objs, *args, **kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            tracking_bulk_create(objs, self.db)
+        return objs
+
+    def delete(self):
+        """
+        Delete the objects and write the DELETE events of all the deleted
+        objects, cascades included, in one batch.
+        """
+        with defer_tracking(using=self.db):
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def update(self, **kwargs):
+        """
+        Update the objects and create an UPDATE event for each changed object.
+        The tracked values are fetched before and after the update, only the
+        changed objects are loaded.
+        """
+        fields = self._get_tracked_fields(kwargs)
+        if not fields:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            original_values = get_tracked_values(self, fields)
+            rows = super().update(**kwargs)
+            tracking_update(self.model, original_values, fields, self.db)
+        return rows
+
+    update.alters_data = True
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        """
+        Update the objects and create an UPDATE event for each changed object.
+        """
+        tracked_fields = self._get_tracked_fields(fields)
+        if not tracked_fields:
+            return super().bulk_update(objs, fields, batch_size=batch_size)
+        objs = list(objs)
+        # The original values are known, the updates made by ``bulk_update``
+        # do not need to be tracked.
+        untracked = self._chain()
+        untracked._tracking_disabled = True
+        with transaction.atomic(using=self.db, savepoint=False):
+            rows = super(TrackingQuerySet, untracked).bulk_update(
+                objs, fields, batch_size=batch_size
+            )
+            tracking_bulk_update(objs, tracked_fields, self.db)
+        return rows
+
+    bulk_update.alters_data = True
+
+
+class TrackingManager(models.Manager.from_queryset(TrackingQuerySet)):
+    """
+    Manager tracking the changes made with ``bulk_create``, ``update``,
+    ``bulk_update`` and ``delete``.
+    """
@@ -1,43 +1,174 @@
 from __future__ import unicode_literals
 import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.functional import SimpleLazyObject
+
+# Username to ``(identity, expiry time)``, least recently used first
+_username_identities = OrderedDict()
+_username_identities_lock = threading.Lock()
+
+
+def _get_user_by_username(username):
+    return get_user_model().objects.get(username=username)
+
+
+def _get_identity(user):
+    if user is None or user.is_anonymous:
+        return (None, None, repr(user))
+    return (ContentType.objects.get_for_model(user).pk, user.pk, repr(user))
+
+
+def get_username_identity(username):
+    """
+    Get the identity of a user from its username, cached for
+    ``TRACKING_FIELDS_USERNAME_CACHE_TIMEOUT`` seconds (300 by default) in a
+    cache of ``TRACKING_FIELDS_USERNAME_CACHE_SIZE`` users (1000 by default).
+    An unknown username is given as the representation of a missing user.
+    """
+    now = time.monotonic()
+    with _username_identities_lock:
+        cached = _username_identities.get(username)
+        if cached is not None and cached[1] > now:
+            _username_identities.move_to_end(username)
+            return cached[0]
+    try:
+        identity = _get_identity(_get_user_by_username(username))
+    except ObjectDoesNotExist:
+        # Not cached, the user may be created later
+        return (None, None, username)
+    timeout = getattr(settings, 'TRACKING_FIELDS_USERNAME_CACHE_TIMEOUT', 300)
+    size = getattr(settings, 'TRACKING_FIELDS_USERNAME_CACHE_SIZE', 1000)
+    with _username_identities_lock:
+        _username_identities[username] = (identity, now + timeout)
+        _username_identities.move_to_end(username)
+        while len(_username_identities) > size:
+            _username_identities.popitem(last=False)
+    return identity
+
+
+def clear_username_identities():
+    """
+    Clear the cache of the users identities, e.g. after renaming a user
+    """
+    with _username_identities_lock:
+        _username_identities.clear()
 
 
 class CuserMiddleware:
-    _thread_local = threading.local()
+    """
+    Store the user of the current request.
+
+    The user is kept in context variables, which are local to the thread with
+    WSGI and to the request task with ASGI, and are given to the threads
+    running the sync code of an async request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    _user = ContextVar('tracking_fields_user', default=None)
+    _username = ContextVar('tracking_fields_username', default=None)
+    _user_identity = ContextVar('tracking_fields_user_identity', default=None)
+    _cache = ContextVar('tracking_fields_request_cache', default=None)
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
         try:
             self.__class__.set_user(request.user)
+            self.__class__._cache.set({})
             response = self.get_response(request)
             return response
         finally:
             self.__class__.del_user()
+            self.__class__.del_request_cache()
+
+    async def __acall__(self, request):
+        try:
+            # ``request.user`` is lazy, it is only loaded by the sync code
+            # building the events
+            self.__class__.set_user(request.user)
+            self.__class__._cache.set({})
+            response = await self.get_response(request)
+            return response
+        finally:
+            self.__class__.del_user()
+            self.__class__.del_request_cache()
 
     @classmethod
     def get_user(cls, default=None):
         """
         Retrieve user info
         """
-        return getattr(cls._thread_local, 'user', default)
+        user = cls._user.get()
+        return default if user is None else user
 
     @classmethod
     def set_user(cls, user):
         """
-        Store user info
+        Store user info. A username can be given instead of a user, the user
+        is then only loaded when accessed and its identity is cached.
         """
         if isinstance(user, str):
-            user_model = get_user_model()
-            user = user_model.objects.get(username=user)
-        cls._thread_local.user = user
+            cls._username.set(user)
+            user = SimpleLazyObject(partial(_get_user_by_username, user))
+        else:
+            cls._username.set(None)
+        cls._user.set(user)
 
     @classmethod
     def del_user(cls):
         """
         Delete user info
         """
-        if hasattr(cls._thread_local, 'user'):
-            del cls._thread_local.user
\ No newline at end of file
+        cls._user.set(None)
+        cls._username.set(None)
+        cls._user_identity.set(None)
+
+    @classmethod
+    def get_user_identity(cls):
+        """
+        Retrieve the content type id, id and representation of the user,
+        computed once for the current user. The content type id and id are
+        None for anonymous users and without user.
+        """
+        user = cls.get_user()
+        cached = cls._user_identity.get()
+        if cached is not None and cached[0] is user:
+            return cached[1]
+        username = cls._username.get()
+        if username is not None:
+            identity = get_username_identity(username)
+        else:
+            identity = _get_identity(user)
+        cls._user_identity.set((user, identity))
+        return identity
+
+    @classmethod
+    def get_request_cache(cls):
+        """
+        Retrieve the cache of the current request, None outside of a request
+        """
+        return cls._cache.get()
+
+    @classmethod
+    def del_request_cache(cls):
+        """
+        Delete the cache of the current request
+        """
+        cls._cache.set(None)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracking_fields", "0003_auto_20220309_0347"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="trackingevent",
+            name="date",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False, verbose_name="Date"
+            ),
+        ),
+    ]
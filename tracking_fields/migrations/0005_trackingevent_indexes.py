@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("tracking_fields", "0004_trackingevent_date_default"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trackingevent",
+            index=models.Index(
+                fields=["object_content_type", "object_id", "-date"],
+                name="tracking_event_object_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trackingevent",
+            index=models.Index(
+                fields=["user_content_type", "user_id", "-date"],
+                name="tracking_event_user_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trackingevent",
+            index=models.Index(fields=["-date"], name="tracking_event_date_idx"),
+        ),
+    ]
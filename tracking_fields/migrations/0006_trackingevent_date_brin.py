@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def create_brin_index(apps, schema_editor):
+    """
+    Create a BRIN index on the date of the events with PostgreSQL, if the
+    ``TRACKING_FIELDS_POSTGRES_BRIN_INDEX`` setting is True.
+    Events being inserted in date order, it is much smaller than a B-tree.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    if not getattr(settings, "TRACKING_FIELDS_POSTGRES_BRIN_INDEX", False):
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS tracking_event_date_brin "
+        "ON tracking_fields_trackingevent USING brin (date)"
+    )
+
+
+def drop_brin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS tracking_event_date_brin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracking_fields", "0005_trackingevent_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_brin_index, drop_brin_index),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_gin_indexes(apps, schema_editor):
+    """
+    Create GIN indexes on the JSON values with PostgreSQL, if the
+    ``TRACKING_FIELDS_POSTGRES_GIN_INDEX`` setting is True.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    if not getattr(settings, "TRACKING_FIELDS_POSTGRES_GIN_INDEX", False):
+        return
+    for column in ("old_value_json", "new_value_json"):
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS tracking_field_{0}_gin "
+            "ON tracking_fields_trackedfieldmodification "
+            "USING gin ({0} jsonb_path_ops)".format(column)
+        )
+
+
+def drop_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for column in ("old_value_json", "new_value_json"):
+        schema_editor.execute(
+            "DROP INDEX IF EXISTS tracking_field_{0}_gin".format(column)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracking_fields", "0006_trackingevent_date_brin"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trackedfieldmodification",
+            name="new_value_json",
+            field=models.JSONField(editable=False, null=True, verbose_name="New value"),
+        ),
+        migrations.AddField(
+            model_name="trackedfieldmodification",
+            name="old_value_json",
+            field=models.JSONField(editable=False, null=True, verbose_name="Old value"),
+        ),
+        migrations.RunPython(create_gin_indexes, drop_gin_indexes),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:22
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracking_fields", "0007_trackedfieldmodification_json_values"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrackingContext",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "date",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="Date",
+                    ),
+                ),
+                (
+                    "correlation_id",
+                    models.CharField(
+                        blank=True,
+                        db_index=True,
+                        editable=False,
+                        max_length=250,
+                        verbose_name="Correlation id",
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        blank=True,
+                        editable=False,
+                        max_length=250,
+                        verbose_name="Source",
+                    ),
+                ),
+                (
+                    "reason",
+                    models.TextField(blank=True, editable=False, verbose_name="Reason"),
+                ),
+            ],
+            options={
+                "verbose_name": "Tracking context",
+                "verbose_name_plural": "Tracking contexts",
+            },
+        ),
+        migrations.AddField(
+            model_name="trackingevent",
+            name="context",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="events",
+                to="tracking_fields.trackingcontext",
+                verbose_name="Context",
+            ),
+        ),
+    ]
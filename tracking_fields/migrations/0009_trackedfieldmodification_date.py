@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:40
+
+import django.utils.timezone
+from django.db import migrations, models, transaction
+
+# Number of modifications updated in one transaction
+BATCH_SIZE = 1000
+
+
+def copy_event_dates(apps, schema_editor):
+    """
+    Give the existing modifications the date of their event, by batches of
+    ``BATCH_SIZE`` modifications following their primary key, each updated in
+    its own transaction.
+    """
+    using = schema_editor.connection.alias
+    TrackedFieldModification = apps.get_model(
+        "tracking_fields", "TrackedFieldModification"
+    )
+    TrackingEvent = apps.get_model("tracking_fields", "TrackingEvent")
+    modifications = TrackedFieldModification.objects.using(using)
+    dates = TrackingEvent.objects.filter(pk=models.OuterRef("event_id")).values("date")
+    last_pk = None
+    while True:
+        batch = modifications.order_by("pk")
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        pks = list(batch.values_list("pk", flat=True)[:BATCH_SIZE])
+        if not pks:
+            return
+        last_pk = pks[-1]
+        with transaction.atomic(using=using):
+            modifications.filter(pk__in=pks).update(date=models.Subquery(dates[:1]))
+
+
+class Migration(migrations.Migration):
+
+    # The modifications are updated by batches
+    atomic = False
+
+    dependencies = [
+        ("tracking_fields", "0008_trackingcontext"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trackedfieldmodification",
+            name="date",
+            field=models.DateTimeField(editable=False, null=True, verbose_name="Date"),
+        ),
+        migrations.RunPython(copy_event_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="trackedfieldmodification",
+            name="date",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False, verbose_name="Date"
+            ),
+        ),
+    ]
@@ -9,6 +9,7 @@ except ImportError:
 
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.utils.translation import pgettext_lazy
 
@@ -22,6 +23,41 @@ REMOVE = "REMOVE"
 CLEAR = "CLEAR"
 
 
+class TrackingContext(models.Model):
+    """
+    Metadata shared by the events of a request, job or batch, written once
+    for all of them. See ``tracking_fields.context.tracking_context``.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    date = models.DateTimeField(_("Date"), default=timezone.now, editable=False)
+
+    correlation_id = models.CharField(
+        _("Correlation id"),
+        max_length=250,
+        blank=True,
+        db_index=True,
+        editable=False,
+    )
+
+    source = models.CharField(_("Source"), max_length=250, blank=True, editable=False)
+
+    reason = models.TextField(_("Reason"), blank=True, editable=False)
+
+    # Set by the writer once the context is written and committed
+    written = False
+
+    class Meta:
+        verbose_name = _("Tracking context")
+        verbose_name_plural = _("Tracking contexts")
+
+    def __str__(self):
+        return " - ".join(
+            value for value in (self.source, self.reason, self.correlation_id) if value
+        ) or str(self.pk)
+
+
 class TrackingEvent(models.Model):
     ACTIONS = (
         (CREATE, _("Create")),
@@ -34,7 +70,8 @@ class TrackingEvent(models.Model):
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
-    date = models.DateTimeField(_("Date"), auto_now_add=True, editable=False)
+    # Not auto_now_add so that buffered events keep the date of the change
+    date = models.DateTimeField(_("Date"), default=timezone.now, editable=False)
 
     action = models.CharField(
         _("Action"), max_length=6, choices=ACTIONS, editable=False
@@ -73,10 +110,32 @@ class TrackingEvent(models.Model):
         editable=False,
     )
 
+    context = models.ForeignKey(
+        TrackingContext,
+        verbose_name=_("Context"),
+        related_name="events",
+        editable=False,
+        null=True,
+        on_delete=models.SET_NULL,
+    )
+
     class Meta:
         verbose_name = _("Tracking event")
         verbose_name_plural = _("Tracking events")
         ordering = ["-date"]
+        indexes = [
+            # History of an object
+            models.Index(
+                fields=["object_content_type", "object_id", "-date"],
+                name="tracking_event_object_idx",
+            ),
+            # Activity of a user
+            models.Index(
+                fields=["user_content_type", "user_id", "-date"],
+                name="tracking_event_user_idx",
+            ),
+            models.Index(fields=["-date"], name="tracking_event_date_idx"),
+        ]
 
     def get_object_model(self):
         if self.object_id is None:
@@ -100,6 +159,9 @@ class TrackedFieldModification(models.Model):
         on_delete=models.CASCADE,
     )
 
+    # Date of the event, to partition the modifications like the events
+    date = models.DateTimeField(_("Date"), default=timezone.now, editable=False)
+
     field = models.CharField(_("Field"), max_length=250, editable=False)
 
     old_value = models.TextField(
@@ -116,6 +178,12 @@ class TrackedFieldModification(models.Model):
         editable=False,
     )
 
+    # Only filled with the TRACKING_FIELDS_JSON_VALUES setting, to query the
+    # values in the database
+    old_value_json = models.JSONField(_("Old value"), null=True, editable=False)
+
+    new_value_json = models.JSONField(_("New value"), null=True, editable=False)
+
     class Meta:
         verbose_name = _("Tracking field modification")
         verbose_name_plural = _("Tracking field modifications")
@@ -0,0 +1,275 @@
+"""
+Remove the old tracking events.
+
+With PostgreSQL, the events table can be partitioned by range on its date
+(see the README), and so can the modifications table on the date of their
+event. Monthly partitions are then created in advance, and the old ones are
+dropped or detached instead of deleting their events. Otherwise, the old
+events are deleted in batches.
+"""
+
+from __future__ import unicode_literals
+
+import datetime
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from tracking_fields.models import (
+    TrackedFieldModification,
+    TrackingContext,
+    TrackingEvent,
+)
+
+_BOUND_RE = re.compile(r"FOR VALUES FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def is_partitioned(using=DEFAULT_DB_ALIAS, model=TrackingEvent):
+    """
+    Check the table of the events, or of ``model``, is partitioned.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass",
+            [model._meta.db_table],
+        )
+        return cursor.fetchone() is not None
+
+
+def _parse_bound_date(value):
+    # PostgreSQL may only give the hours of the UTC offset
+    if re.search(r"[+-]\d\d$", value):
+        value += ":00"
+    date = datetime.datetime.fromisoformat(value)
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, datetime.timezone.utc)
+    return date
+
+
+def parse_partition_bound(bound):
+    """
+    Get the start and end dates of a partition from its bound expression,
+    None for a default partition.
+    """
+    match = _BOUND_RE.search(bound)
+    if match is None:
+        return None
+    return _parse_bound_date(match.group(1)), _parse_bound_date(match.group(2))
+
+
+def get_partitions(using=DEFAULT_DB_ALIAS, model=TrackingEvent):
+    """
+    Get the names, start and end dates of the partitions of the table of the
+    events, or of ``model``, sorted by date.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass",
+            [model._meta.db_table],
+        )
+        rows = cursor.fetchall()
+    partitions = []
+    for name, bound in rows:
+        dates = parse_partition_bound(bound)
+        if dates is not None:
+            partitions.append((name, dates[0], dates[1]))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def _add_month(date):
+    if date.month == 12:
+        return date.replace(year=date.year + 1, month=1)
+    return date.replace(month=date.month + 1)
+
+
+def _get_partitioned_models(using):
+    """
+    Get the partitioned models, the events first.
+    """
+    return [
+        model
+        for model in (TrackingEvent, TrackedFieldModification)
+        if is_partitioned(using, model)
+    ]
+
+
+def create_partitions(months=3, using=DEFAULT_DB_ALIAS):
+    """
+    Create the monthly partitions of the current month and of the ``months``
+    next ones, if they do not exist yet, for the events and for the
+    modifications if their table is partitioned too.
+
+    :return: The names of the partitions.
+    """
+    if not is_partitioned(using):
+        raise ValueError("The tracking events table is not partitioned.")
+    connection = connections[using]
+    names = []
+    with connection.cursor() as cursor:
+        for model in _get_partitioned_models(using):
+            table = model._meta.db_table
+            start = timezone.now().date().replace(day=1)
+            for _i in range(months + 1):
+                end = _add_month(start)
+                name = "{0}_p{1:%Y%m}".format(table, start)
+                cursor.execute(
+                    "CREATE TABLE IF NOT EXISTS {0} PARTITION OF {1} "
+                    "FOR VALUES FROM (%s) TO (%s)".format(
+                        connection.ops.quote_name(name),
+                        connection.ops.quote_name(table),
+                    ),
+                    [start.isoformat(), end.isoformat()],
+                )
+                names.append(name)
+                start = end
+    return names
+
+
+def drop_partitions(before, detach=False, using=DEFAULT_DB_ALIAS):
+    """
+    Drop, or detach, the partitions of the events older than ``before``, and
+    the ones of their modifications if their table is partitioned too.
+
+    :return: The names of the dropped partitions.
+    """
+    connection = connections[using]
+    names = []
+    with connection.cursor() as cursor:
+        for model in _get_partitioned_models(using):
+            table = connection.ops.quote_name(model._meta.db_table)
+            for name, _start, end in get_partitions(using, model):
+                if end > before:
+                    continue
+                if detach:
+                    cursor.execute(
+                        "ALTER TABLE {0} DETACH PARTITION {1}".format(
+                            table, connection.ops.quote_name(name)
+                        )
+                    )
+                else:
+                    cursor.execute(
+                        "DROP TABLE {0}".format(connection.ops.quote_name(name))
+                    )
+                names.append(name)
+    return names
+
+
+def delete_events(before, batch_size=1000, using=DEFAULT_DB_ALIAS):
+    """
+    Delete the events older than ``before`` and their modifications, by
+    batches of ``batch_size`` events each in its own transaction.
+
+    :return: The number of deleted events.
+    """
+    events = TrackingEvent.objects.using(using)
+    deleted = 0
+    while True:
+        pks = list(
+            events.filter(date__lt=before)
+            .order_by()
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return deleted
+        with transaction.atomic(using=using):
+            events.filter(pk__in=pks).delete()
+        deleted += len(pks)
+
+
+def delete_orphan_modifications(before, batch_size=1000, using=DEFAULT_DB_ALIAS):
+    """
+    Delete, by batches, the modifications older than ``before`` of the events
+    which have been removed with their partition, when the modifications table
+    is not partitioned. The modifications are walked once, by batches of
+    ``batch_size`` following their primary key.
+
+    :return: The number of deleted modifications.
+    """
+    modifications = TrackedFieldModification.objects.using(using)
+    old_modifications = modifications.filter(date__lt=before).order_by("pk")
+    events = TrackingEvent.objects.using(using)
+    deleted = 0
+    last_pk = None
+    while True:
+        batch = old_modifications
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        rows = list(batch.values_list("pk", "event_id")[:batch_size])
+        if not rows:
+            return deleted
+        last_pk = rows[-1][0]
+        event_ids = set(
+            events.filter(pk__in={event_id for _pk, event_id in rows}).values_list(
+                "pk", flat=True
+            )
+        )
+        pks = [pk for pk, event_id in rows if event_id not in event_ids]
+        if pks:
+            modifications.filter(pk__in=pks).delete()
+            deleted += len(pks)
+
+
+def delete_orphan_contexts(before, batch_size=1000, using=DEFAULT_DB_ALIAS):
+    """
+    Delete, by batches, the contexts older than ``before`` without events.
+    The contexts are walked once, by batches of ``batch_size`` following their
+    primary key.
+
+    :return: The number of deleted contexts.
+    """
+    contexts = TrackingContext.objects.using(using)
+    old_contexts = contexts.filter(date__lt=before).order_by("pk")
+    events = TrackingEvent.objects.using(using)
+    deleted = 0
+    last_pk = None
+    while True:
+        batch = old_contexts
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        context_ids = list(batch.values_list("pk", flat=True)[:batch_size])
+        if not context_ids:
+            return deleted
+        last_pk = context_ids[-1]
+        used_ids = set(
+            events.filter(context__in=context_ids)
+            .order_by()
+            .values_list("context_id", flat=True)
+            .distinct()
+        )
+        pks = [pk for pk in context_ids if pk not in used_ids]
+        if pks:
+            contexts.filter(pk__in=pks).delete()
+            deleted += len(pks)
+
+
+def apply_retention(before, detach=False, batch_size=1000, using=DEFAULT_DB_ALIAS):
+    """
+    Remove the events older than ``before``. With a partitioned table, only
+    the partitions entirely older than ``before`` are removed, and the
+    modifications of their events are deleted afterwards if their table is not
+    partitioned too. The contexts left without events are then deleted, unless
+    partitions are detached.
+
+    :return: The names of the removed partitions and the number of deleted
+        events and modifications.
+    """
+    if is_partitioned(using):
+        partitions = drop_partitions(before, detach=detach, using=using)
+        deleted = 0
+        if partitions and not detach:
+            if not is_partitioned(using, TrackedFieldModification):
+                deleted = delete_orphan_modifications(
+                    before, batch_size=batch_size, using=using
+                )
+            delete_orphan_contexts(before, batch_size=batch_size, using=using)
+        return partitions, 0, deleted
+    events = delete_events(before, batch_size=batch_size, using=using)
+    delete_orphan_contexts(before, batch_size=batch_size, using=using)
+    return [], events, 0
@@ -0,0 +1,147 @@
+"""
+Serialize the values of the tracked fields to JSON.
+
+The values are first converted to JSON compatible values by ``to_json``,
+which dispatches on their type. Register a converter for your own types::
+
+    from tracking_fields.serializers import to_json
+
+    @to_json.register(Money)
+    def _(value):
+        return str(value)
+
+The JSON backend is set with the ``TRACKING_FIELDS_JSON_BACKEND`` setting:
+``"json"`` (default) or ``"orjson"``, faster but which must be installed.
+``json`` keeps the format of the stored values, with a space after the
+separators, while ``orjson`` writes compact JSON: only the loaded values can
+be compared across backends.
+"""
+
+from __future__ import unicode_literals
+
+import datetime
+import json
+import logging
+import uuid
+from functools import singledispatch
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import Model
+from django.db.models.fields.files import FieldFile
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from xworkflows.base import StateWrapper
+except ImportError:
+    StateWrapper = None
+
+logger = logging.getLogger(__name__)
+
+
+@singledispatch
+def to_json(value):
+    """
+    Convert a value to a JSON compatible value. Values of unregistered types
+    are given as is to the JSON backend.
+    """
+    return value
+
+
+@to_json.register(datetime.datetime)
+def _datetime_to_json(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+@to_json.register(datetime.date)
+def _date_to_json(value):
+    return value.strftime("%Y-%m-%d")
+
+
+@to_json.register(datetime.time)
+def _time_to_json(value):
+    return value.strftime("%H:%M:%S")
+
+
+@to_json.register(FieldFile)
+def _file_to_json(value):
+    try:
+        return value.path
+    except ValueError:
+        # No file
+        return None
+
+
+@to_json.register(uuid.UUID)
+@to_json.register(Model)
+def _str_to_json(value):
+    return str(value)
+
+
+if StateWrapper is not None:
+
+    @to_json.register(StateWrapper)
+    def _state_to_json(value):
+        return value.name
+
+
+def _json_dumps(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _orjson_dumps(value):
+    try:
+        return orjson.dumps(value).decode("utf-8")
+    except TypeError:
+        # orjson does not handle everything json does, e.g. big integers
+        return _json_dumps(value)
+
+
+_dumps = None
+
+# Serialized as is, without looking for a converter
+_NATIVE_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def get_dumps():
+    """
+    Get the ``dumps`` function of the JSON backend.
+    """
+    global _dumps
+    if _dumps is None:
+        backend = getattr(settings, "TRACKING_FIELDS_JSON_BACKEND", "json")
+        if backend == "orjson":
+            if orjson is None:
+                raise ImportError("orjson must be installed to use it as JSON backend.")
+            _dumps = _orjson_dumps
+        else:
+            _dumps = _json_dumps
+    return _dumps
+
+
+def serialize(value):
+    """
+    Serialize a value of a tracked field to JSON.
+    Values which can not be serialized are stored as their ``repr``.
+    """
+    dumps = _dumps or get_dumps()
+    try:
+        if value.__class__ in _NATIVE_TYPES:
+            return dumps(value)
+        return dumps(to_json(value))
+    except TypeError:
+        logger.warning("Could not serialize field {0}".format(repr(value)))
+        return _json_dumps(repr(value))
+
+
+def _setting_changed(setting, **kwargs):
+    global _dumps
+    if setting == "TRACKING_FIELDS_JSON_BACKEND":
+        _dumps = None
+
+
+setting_changed.connect(_setting_changed)
@@ -0,0 +1,106 @@
+import calendar
+import datetime
+
+from django import template
+from django.db import models
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+
+@register.inclusion_tag("admin/date_hierarchy.html")
+def lazy_date_hierarchy(cl):
+    """
+    Display the date hierarchy of a change list without looking for the dates
+    having objects, which needs to aggregate all the filtered objects.
+    Only the first and last dates are fetched, every month of a year and every
+    day of a month are then listed.
+    """
+    field_name = cl.date_hierarchy
+    year_field = "%s__year" % field_name
+    month_field = "%s__month" % field_name
+    day_field = "%s__day" % field_name
+    try:
+        year_lookup = int(cl.params.get(year_field) or 0)
+        month_lookup = int(cl.params.get(month_field) or 0)
+        day_lookup = int(cl.params.get(day_field) or 0)
+    except ValueError:
+        return {"show": False}
+
+    def link(filters):
+        return cl.get_query_string(filters, ["%s__" % field_name])
+
+    if year_lookup and month_lookup and day_lookup:
+        day = datetime.date(year_lookup, month_lookup, day_lookup)
+        return {
+            "show": True,
+            "back": {
+                "link": link({year_field: year_lookup, month_field: month_lookup}),
+                "title": capfirst(formats.date_format(day, "YEAR_MONTH_FORMAT")),
+            },
+            "choices": [
+                {"title": capfirst(formats.date_format(day, "MONTH_DAY_FORMAT"))}
+            ],
+        }
+    if year_lookup and month_lookup:
+        days = calendar.monthrange(year_lookup, month_lookup)[1]
+        return {
+            "show": True,
+            "back": {
+                "link": link({year_field: year_lookup}),
+                "title": str(year_lookup),
+            },
+            "choices": [
+                {
+                    "link": link(
+                        {
+                            year_field: year_lookup,
+                            month_field: month_lookup,
+                            day_field: day,
+                        }
+                    ),
+                    "title": capfirst(
+                        formats.date_format(
+                            datetime.date(year_lookup, month_lookup, day),
+                            "MONTH_DAY_FORMAT",
+                        )
+                    ),
+                }
+                for day in range(1, days + 1)
+            ],
+        }
+    if year_lookup:
+        return {
+            "show": True,
+            "back": {"link": link({}), "title": _("All dates")},
+            "choices": [
+                {
+                    "link": link({year_field: year_lookup, month_field: month}),
+                    "title": capfirst(
+                        formats.date_format(
+                            datetime.date(year_lookup, month, 1), "YEAR_MONTH_FORMAT"
+                        )
+                    ),
+                }
+                for month in range(1, 13)
+            ],
+        }
+    date_range = cl.queryset.aggregate(
+        first=models.Min(field_name), last=models.Max(field_name)
+    )
+    if date_range["first"] is None:
+        return {"show": False}
+    first, last = (
+        timezone.localtime(date) if timezone.is_aware(date) else date
+        for date in (date_range["first"], date_range["last"])
+    )
+    return {
+        "show": True,
+        "back": None,
+        "choices": [
+            {"link": link({year_field: str(year)}), "title": str(year)}
+            for year in range(first.year, last.year + 1)
+        ],
+    }
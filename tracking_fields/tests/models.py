@@ -3,6 +3,7 @@ import uuid
 from django.db import models
 
 from tracking_fields.decorators import track
+from tracking_fields.managers import TrackingManager
 
 
 @track("value")
@@ -21,6 +22,8 @@ class Pet(models.Model):
     age = models.PositiveSmallIntegerField()
     picture = models.ImageField(upload_to=".", null=True)
 
+    objects = TrackingManager()
+
     def __unicode__(self):
         return "{0}".format(self.name)
 
@@ -39,6 +42,8 @@ class Human(models.Model):
     )
     height = models.PositiveIntegerField(help_text="Not tracked")
 
+    objects = TrackingManager()
+
     def __unicode__(self):
         return "{0}".format(self.name)
 
@@ -49,3 +54,26 @@ class House(models.Model):
 
     def __unicode__(self):
         return "House of {0}".format(self.tenant)
+
+
+@track("value", "human", lazy=True)
+class LazyModel(models.Model):
+    value = models.CharField(max_length=30)
+    human = models.ForeignKey(Human, null=True, on_delete=models.CASCADE)
+
+    objects = TrackingManager()
+
+    def __unicode__(self):
+        return "{0}".format(self.value)
+
+
+@track("target")
+class ForwardModel(models.Model):
+    target = models.ForeignKey("ForwardTarget", null=True, on_delete=models.CASCADE)
+
+
+class ForwardTarget(models.Model):
+    name = models.CharField(max_length=30)
+
+    def __str__(self):
+        return self.name
@@ -1,17 +1,49 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import asyncio
 import datetime
 import json
+import os
+import tempfile
+import time
+import uuid
+from io import StringIO
+from unittest import mock
 
-from tracking_fields.middleware.cuser import CuserMiddleware
-from django.contrib.auth.models import User
+from tracking_fields.middleware.cuser import (
+    CuserMiddleware,
+    clear_username_identities,
+    get_username_identity,
+)
+from asgiref.sync import iscoroutinefunction
+import django
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser, User
 from django.contrib.contenttypes.models import ContentType
 from django.core.files import File
-from django.test import Client, TestCase
+from django.core.management import CommandError, call_command
+from django.db import connection, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_init
+from django.template.loader import render_to_string
+from django.test import (
+    Client,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext, isolate_apps
 from django.utils import timezone
 from django.utils.html import escape
 
+from tracking_fields.admin import TrackerEventUserSearchFilter, TrackingEventAdmin
+from tracking_fields.archive import archive_events, read_archive, restore_archive
+from tracking_fields.buffer import defer_tracking
+from tracking_fields.context import get_tracking_context, tracking_context
+from tracking_fields.decorators import track
+from tracking_fields.history import get_m2m_values
 from tracking_fields.models import (
     ADD,
     CLEAR,
@@ -19,9 +51,29 @@ from tracking_fields.models import (
     DELETE,
     REMOVE,
     UPDATE,
+    TrackedFieldModification,
+    TrackingContext,
     TrackingEvent,
 )
-from tracking_fields.tests.models import House, Human, Pet, UuidModel
+from tracking_fields.tests.models import (
+    ForwardModel,
+    ForwardTarget,
+    House,
+    Human,
+    LazyModel,
+    Pet,
+    UuidModel,
+)
+from tracking_fields.retention import (
+    delete_events,
+    delete_orphan_contexts,
+    delete_orphan_modifications,
+    is_partitioned,
+    parse_partition_bound,
+)
+from tracking_fields.serializers import serialize, to_json
+from tracking_fields.tracking import Changes, _get_changes
+from tracking_fields.writer import AsyncTrackingWriter, get_writer, shutdown_writer
 
 
 class TrackingEventTestCase(TestCase):
@@ -200,6 +252,59 @@ class TrackingEventTestCase(TestCase):
         events = TrackingEvent.objects.all()
         assert events.count() == 3
 
+    def test_no_lookup(self):
+        """
+        Content types and user identity are cached, building an event does
+        not make any query
+        """
+        self.human.age = 43
+        with CaptureQueriesContext(connection) as ctx:
+            self.human.save()
+        assert not [
+            query
+            for query in ctx.captured_queries
+            if "django_content_type" in query["sql"]
+        ]
+        event = TrackingEvent.objects.order_by("date").last()
+        assert event.object_content_type == ContentType.objects.get_for_model(Human)
+        assert event.user == self.user
+
+    def test_user_identity(self):
+        identity = CuserMiddleware.get_user_identity()
+        assert identity == (
+            ContentType.objects.get_for_model(User).pk,
+            self.user.pk,
+            self.user_repr,
+        )
+        assert CuserMiddleware.get_user_identity() is identity
+        anonymous = AnonymousUser()
+        CuserMiddleware.set_user(anonymous)
+        try:
+            assert CuserMiddleware.get_user_identity() == (
+                None,
+                None,
+                repr(anonymous),
+            )
+        finally:
+            CuserMiddleware.set_user(User.objects.get())
+
+    def test_indexes(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, TrackingEvent._meta.db_table
+            )
+        assert constraints["tracking_event_object_idx"]["columns"] == [
+            "object_content_type_id",
+            "object_id",
+            "date",
+        ]
+        assert constraints["tracking_event_user_idx"]["columns"] == [
+            "user_content_type_id",
+            "user_id",
+            "date",
+        ]
+        assert constraints["tracking_event_date_idx"]["columns"] == ["date"]
+
 
 class TrackedFieldModificationTestCase(TestCase):
     def setUp(self):
@@ -375,6 +480,114 @@ class TrackedFieldModificationTestCase(TestCase):
         assert field.new_value == json.dumps(str(human.name))
 
 
+class CuserMiddlewareTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="Toto")
+        cls.user2 = User.objects.create_user(username="Tutu")
+
+    def test_sync(self):
+        def get_response(request):
+            assert CuserMiddleware.get_user() is request.user
+            assert CuserMiddleware.get_request_cache() == {}
+            return "response"
+
+        request = RequestFactory().get("/")
+        request.user = self.user
+        middleware = CuserMiddleware(get_response)
+        assert not iscoroutinefunction(middleware)
+        assert middleware(request) == "response"
+        assert CuserMiddleware.get_user() is None
+        assert CuserMiddleware.get_request_cache() is None
+
+    async def test_async_concurrent_requests(self):
+        """Each request only sees its own user, also from sync code"""
+
+        async def get_response(request):
+            await asyncio.sleep(0)
+            assert CuserMiddleware.get_user() is request.user
+            human = await Human.objects.acreate(
+                name=request.user.username, age=42, height=175
+            )
+            await asyncio.sleep(0)
+            assert CuserMiddleware.get_user() is request.user
+            return human
+
+        middleware = CuserMiddleware(get_response)
+        assert iscoroutinefunction(middleware)
+        requests = []
+        for user in (self.user, self.user2):
+            request = RequestFactory().get("/")
+            request.user = user
+            requests.append(request)
+        user = CuserMiddleware.get_user()
+        humans = await asyncio.gather(*(middleware(request) for request in requests))
+        assert CuserMiddleware.get_user() is user
+        for human, user in zip(humans, (self.user, self.user2)):
+            event = await TrackingEvent.objects.aget(
+                object_content_type__model="human", object_id=human.pk
+            )
+            assert event.user_id == user.pk
+
+
+class UsernameTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="Toto")
+
+    def setUp(self):
+        clear_username_identities()
+        self.addCleanup(clear_username_identities)
+        self.addCleanup(CuserMiddleware.del_user)
+
+    def test_lazy_user(self):
+        with self.assertNumQueries(0):
+            CuserMiddleware.set_user("Toto")
+        assert CuserMiddleware.get_user() == self.user
+
+    def test_identity_cached(self):
+        CuserMiddleware.set_user("Toto")
+        Human.objects.create(name="Jean", age=30, height=170)
+        CuserMiddleware.set_user("Toto")
+        with CaptureQueriesContext(connection) as ctx:
+            Human.objects.create(name="Pierre", age=30, height=170)
+        assert not [
+            query for query in ctx.captured_queries if "auth_user" in query["sql"]
+        ]
+        for event in TrackingEvent.objects.all():
+            assert event.user == self.user
+            assert event.user_repr == repr(self.user)
+
+    @override_settings(TRACKING_FIELDS_USERNAME_CACHE_TIMEOUT=0)
+    def test_identity_expired(self):
+        get_username_identity("Toto")
+        with self.assertNumQueries(1):
+            get_username_identity("Toto")
+
+    @override_settings(TRACKING_FIELDS_USERNAME_CACHE_SIZE=1)
+    def test_identity_least_recently_used(self):
+        User.objects.create_user(username="Tutu")
+        get_username_identity("Toto")
+        get_username_identity("Tutu")
+        with self.assertNumQueries(0):
+            get_username_identity("Tutu")
+        with self.assertNumQueries(1):
+            get_username_identity("Toto")
+
+    def test_unknown_username(self):
+        CuserMiddleware.set_user("Unknown")
+        Human.objects.create(name="Jean", age=30, height=170)
+        event = TrackingEvent.objects.get()
+        assert event.user_content_type_id is None
+        assert event.user_id is None
+        assert event.user_repr == "Unknown"
+        user = User.objects.create(username="Unknown")
+        CuserMiddleware.set_user("Unknown")
+        human = Human.objects.create(name="Jeanne", age=30, height=170)
+        event = TrackingEvent.objects.get(object_id=human.pk)
+        assert event.user_id == user.pk
+
+
 class TrackingRelatedTestCase(TestCase):
     def setUp(self):
         self.human = Human.objects.create(name="Toto", age=42, height=2)
@@ -395,6 +608,102 @@ class TrackingRelatedTestCase(TestCase):
         assert field.new_value == '"Tutu"'
         assert field.field == "tenant__name"
 
+    def test_foreign_key_change(self):
+        """Old related objects are fetched once for all the events of a save"""
+        pet = Pet.objects.create(name="Pet", age=4)
+        pet2 = Pet.objects.create(name="Pet2", age=2)
+        self.human.favourite_pet = pet
+        self.human.save()
+        self.human.favourite_pet = pet2
+        with CaptureQueriesContext(connection) as ctx:
+            self.human.save()
+        pet_queries = [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT") and "tests_pet" in query["sql"]
+        ]
+        assert len(pet_queries) == 1
+        house_event = (
+            TrackingEvent.objects.filter(object_content_type=self.content_type)
+            .order_by("date")
+            .last()
+        )
+        field = house_event.fields.get()
+        assert field.field == "tenant__favourite_pet"
+        assert field.old_value == json.dumps(str(pet))
+        assert field.new_value == json.dumps(str(pet2))
+
+    def test_single_insert(self):
+        """Events and modifications of a save are inserted with one query each"""
+        self.human.name = "Tutu"
+        self.human.age = 43
+        with CaptureQueriesContext(connection) as ctx:
+            self.human.save()
+        inserts = [
+            query["sql"]
+            for query in ctx.captured_queries
+            if query["sql"].startswith("INSERT")
+        ]
+        assert len(inserts) == 2
+        assert "tracking_fields_trackingevent" in inserts[0]
+        assert "tracking_fields_trackedfieldmodification" in inserts[1]
+        assert TrackingEvent.objects.filter(action=UPDATE).count() == 2
+
+    def test_foreign_key_request_cache(self):
+        """Old related objects are cached during a request"""
+        pet = Pet.objects.create(name="Pet", age=4)
+        pet2 = Pet.objects.create(name="Pet2", age=2)
+        self.human.favourite_pet = pet
+        self.human.save()
+
+        def get_response(request):
+            self.human.favourite_pet = pet2
+            self.human.save()
+            self.human.favourite_pet = pet
+            self.human.save()
+            self.human.favourite_pet = pet2
+            with CaptureQueriesContext(connection) as ctx:
+                self.human.save()
+            return ctx
+
+        request = RequestFactory().get("/")
+        request.user = User.objects.create_user(username="Toto")
+        ctx = CuserMiddleware(get_response)(request)
+        assert not [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT") and "tests_pet" in query["sql"]
+        ]
+        assert CuserMiddleware.get_request_cache() is None
+
+    def test_foreign_key_request_cache_invalidation(self):
+        """Saved related objects are removed from the request cache"""
+        target = ForwardTarget.objects.create(name="one")
+        target2 = ForwardTarget.objects.create(name="two")
+        model = ForwardModel.objects.create(target=target)
+
+        def get_response(request):
+            model.target = target2
+            model.save()
+            target.name = "uno"
+            target.save()
+            model.target = target
+            model.save()
+            model.target = target2
+            model.save()
+
+        request = RequestFactory().get("/")
+        request.user = User.objects.create_user(username="Toto")
+        CuserMiddleware(get_response)(request)
+        fields = TrackedFieldModification.objects.filter(
+            event__object_content_type__model="forwardmodel", event__action=UPDATE
+        ).order_by("date")
+        assert [field.old_value for field in fields] == [
+            json.dumps("one"),
+            json.dumps("two"),
+            json.dumps("uno"),
+        ]
+
     def test_m2m_change(self):
         pet = Pet.objects.create(name="Pet", age=4)
         self.human.pets.add(pet)
@@ -409,6 +718,1130 @@ class TrackingRelatedTestCase(TestCase):
         assert field.old_value == json.dumps([])
         assert field.new_value == json.dumps([str(pet)])
 
+    def test_m2m_queries(self):
+        pets = Pet.objects.bulk_create(
+            [Pet(name="Pet {0}".format(i), age=i) for i in range(10)]
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            self.human.pets.add(*pets)
+        selects = [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT")
+        ]
+        # Added pets, current pets, house, existing through rows
+        assert len(selects) <= 4
+        field = TrackingEvent.objects.get(
+            action=ADD, object_content_type=self.content_type
+        ).fields.get()
+        assert len(json.loads(field.new_value)) == 10
+
+    def test_m2m_reverse_queries(self):
+        humans = [
+            Human.objects.create(name="Human {0}".format(i), age=i, height=150)
+            for i in range(10)
+        ]
+        pet = Pet.objects.create(name="Pet", age=4)
+        with CaptureQueriesContext(connection) as ctx:
+            pet.human_set.add(*humans, self.human)
+        selects = [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT")
+        ]
+        # Humans, their pets and houses, existing through rows
+        assert len(selects) <= 4
+        assert TrackingEvent.objects.filter(action=ADD).count() == 12
+        house_event = TrackingEvent.objects.get(
+            action=ADD, object_content_type=self.content_type
+        )
+        assert house_event.fields.get().new_value == json.dumps([str(pet)])
+        with CaptureQueriesContext(connection) as ctx:
+            pet.human_set.clear()
+        selects = [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT")
+        ]
+        assert len(selects) <= 3
+        assert TrackingEvent.objects.filter(action=REMOVE).count() == 12
+
+
+@override_settings(TRACKING_FIELDS_M2M_FORMAT="compact")
+class CompactM2MTestCase(TestCase):
+    def setUp(self):
+        self.human = Human.objects.create(name="George", age=42, height=175)
+        self.house = House.objects.create(tenant=self.human)
+        self.pet = Pet.objects.create(name="Catz", age=12)
+        self.pet2 = Pet.objects.create(name="Catzou", age=1)
+        self.pet3 = Pet.objects.create(name="Toto", age=3)
+
+    def get_field(self, action, model="human"):
+        return TrackedFieldModification.objects.get(
+            event__action=action, event__object_content_type__model=model
+        )
+
+    def test_add(self):
+        self.human.pets.add(self.pet)
+        self.human.pets.add(self.pet, self.pet2)
+        field = TrackedFieldModification.objects.filter(
+            event__action=ADD, event__object_content_type__model="human"
+        ).order_by("event__date")[1]
+        assert json.loads(field.old_value) == {"removed": [], "reprs": []}
+        assert json.loads(field.new_value) == {
+            "added": [self.pet2.pk],
+            "reprs": [str(self.pet2)],
+        }
+
+    def test_remove(self):
+        self.human.pets.add(self.pet, self.pet2)
+        self.pet3.human_set.remove(self.human)
+        self.pet.human_set.remove(self.human)
+        field = TrackedFieldModification.objects.filter(
+            event__action=REMOVE, event__object_content_type__model="human"
+        ).order_by("event__date")
+        assert json.loads(field[0].old_value)["removed"] == []
+        assert json.loads(field[1].old_value)["removed"] == [self.pet.pk]
+        assert json.loads(field[1].new_value)["added"] == []
+
+    def test_clear(self):
+        self.human.pets.add(self.pet, self.pet2)
+        self.human.pets.clear()
+        field = self.get_field(CLEAR)
+        assert sorted(json.loads(field.old_value)["removed"]) == sorted(
+            [self.pet.pk, self.pet2.pk]
+        )
+
+    @override_settings(TRACKING_FIELDS_M2M_REPRS=False)
+    def test_without_reprs(self):
+        self.human.pets.add(self.pet)
+        field = self.get_field(ADD, model="house")
+        assert field.field == "tenant__pets"
+        assert json.loads(field.new_value) == {"added": [self.pet.pk]}
+
+    def test_get_m2m_values(self):
+        self.human.pets.add(self.pet, self.pet2)
+        self.human.pets.remove(self.pet)
+        self.human.pets.add(self.pet3)
+        self.human.pets.clear()
+        self.human.pets.add(self.pet)
+        fields = TrackedFieldModification.objects.filter(
+            event__object_content_type__model="house"
+        ).order_by("event__date")
+        values = [get_m2m_values(field) for field in fields]
+        pks = sorted([self.pet.pk, self.pet2.pk, self.pet3.pk])
+        assert values == [
+            ([], pks[:2]),
+            (pks[:2], [self.pet2.pk]),
+            ([self.pet2.pk], [self.pet2.pk, self.pet3.pk]),
+            ([self.pet2.pk, self.pet3.pk], []),
+            ([], [self.pet.pk]),
+        ]
+
+    @override_settings(TRACKING_FIELDS_M2M_FORMAT="full")
+    def test_get_m2m_values_full(self):
+        self.human.pets.add(self.pet)
+        field = self.get_field(ADD)
+        assert get_m2m_values(field) == ([], [str(self.pet)])
+
+
+class LazyTrackingTestCase(TestCase):
+    def setUp(self):
+        self.human = Human.objects.create(name="George", age=42, height=175)
+        self.human2 = Human.objects.create(name="Toto", age=21, height=160)
+        LazyModel.objects.create(value="foo", human=self.human)
+        self.model = LazyModel.objects.get()
+
+    def test_no_original_fields_on_init(self):
+        assert "_original_fields" not in self.model.__dict__
+
+    def test_create(self):
+        event = TrackingEvent.objects.order_by("date").last()
+        assert event.action == CREATE
+        assert event.fields.count() == 2
+        field = event.fields.get(field="value")
+        assert field.old_value == json.dumps(None)
+        assert field.new_value == json.dumps("foo")
+
+    def test_update(self):
+        self.model.value = "bar"
+        self.model.value = "baz"
+        self.model.save()
+        event = TrackingEvent.objects.order_by("date").last()
+        assert event.action == UPDATE
+        assert event.fields.count() == 1
+        field = event.fields.get(field="value")
+        assert field.old_value == json.dumps("foo")
+        assert field.new_value == json.dumps("baz")
+        assert "_original_fields" not in self.model.__dict__
+
+    def test_update_twice(self):
+        self.model.value = "bar"
+        self.model.save()
+        self.model.value = "baz"
+        self.model.save()
+        field = TrackingEvent.objects.order_by("date").last().fields.get()
+        assert field.old_value == json.dumps("bar")
+        assert field.new_value == json.dumps("baz")
+
+    def test_foreign_key(self):
+        self.model.human = self.human2
+        self.model.save()
+        event = TrackingEvent.objects.order_by("date").last()
+        field = event.fields.get(field="human")
+        assert field.old_value == json.dumps(str(self.human))
+        assert field.new_value == json.dumps(str(self.human2))
+
+    def test_save_with_no_change(self):
+        self.model.value = "foo"
+        self.model.save()
+        assert TrackingEvent.objects.filter(action=UPDATE).count() == 0
+
+    def test_deferred_field(self):
+        model = LazyModel.objects.only("id").get()
+        model.value = "bar"
+        model.save()
+        assert TrackingEvent.objects.filter(action=UPDATE).count() == 0
+
+    def test_read(self):
+        with self.assertNumQueries(0):
+            assert self.model.value == "foo"
+            assert self.model.human_id == self.human.pk
+        model = LazyModel.objects.only("id").get()
+        with self.assertNumQueries(1):
+            assert model.value == "foo"
+
+    @isolate_apps("tracking_fields.tests")
+    def test_tracked_from_related_model_first(self):
+        class Tenant(models.Model):
+            name = models.CharField(max_length=30)
+
+        @track("tenant__name")
+        class Flat(models.Model):
+            tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE)
+
+        assert post_init.has_listeners(Tenant)
+        track("name", lazy=True)(Tenant)
+        assert not post_init.has_listeners(Tenant)
+
+
+class TrackingQuerySetTestCase(TestCase):
+    def setUp(self):
+        self.pet = Pet.objects.create(name="Catz", age=12)
+        self.pet2 = Pet.objects.create(name="Catzou", age=1)
+        self.human = Human.objects.create(name="George", age=42, height=175)
+        self.human2 = Human.objects.create(name="Toto", age=21, height=160)
+        self.house = House.objects.create(tenant=self.human)
+
+    def test_bulk_create(self):
+        humans = [
+            Human(name="Bulk {0}".format(i), age=i, height=150) for i in range(3)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            Human.objects.bulk_create(humans)
+        inserts = [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith("INSERT INTO")
+        ]
+        # Humans, events and fields
+        assert len(inserts) == 3
+        events = TrackingEvent.objects.filter(
+            action=CREATE, object_id__in=[human.pk for human in humans]
+        )
+        assert events.count() == 3
+        event = events.get(object_id=humans[1].pk)
+        assert event.object == humans[1]
+        field = event.fields.get(field="age")
+        assert field.old_value == json.dumps(None)
+        assert field.new_value == json.dumps(1)
+        # The original values are reset
+        humans[1].age = 2
+        humans[1].save()
+        field = TrackingEvent.objects.get(action=UPDATE).fields.get()
+        assert field.old_value == json.dumps(1)
+
+    def test_bulk_create_lazy(self):
+        LazyModel.objects.bulk_create([LazyModel(value="foo")])
+        field = TrackingEvent.objects.get(
+            action=CREATE, object_content_type__model="lazymodel"
+        ).fields.get(field="value")
+        assert field.new_value == json.dumps("foo")
+
+    def test_delete(self):
+        with CaptureQueriesContext(connection) as ctx:
+            Human.objects.all().delete()
+        inserts = [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith('INSERT INTO "tracking_fields_trackingevent"')
+        ]
+        assert len(inserts) == 1
+        events = TrackingEvent.objects.filter(action=DELETE)
+        # The humans and their house
+        assert events.count() == 3
+        event = events.get(object_content_type__model="human", object_id=self.human.pk)
+        assert event.object_repr == repr(self.human)
+        assert not event.fields.exists()
+
+    def test_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            rows = Human.objects.filter(age__gt=30).update(age=50, height=180)
+        assert rows == 1
+        # Select the values before and after, update, select the changed
+        # objects, insert events and fields
+        assert len(ctx.captured_queries) == 6
+        assert 'name' not in ctx.captured_queries[0]["sql"]
+        event = TrackingEvent.objects.filter(action=UPDATE).get()
+        assert event.object == self.human
+        field = event.fields.get()
+        assert field.field == "age"
+        assert field.old_value == json.dumps(42)
+        assert field.new_value == json.dumps(50)
+
+    def test_update_unchanged(self):
+        with CaptureQueriesContext(connection) as ctx:
+            rows = Human.objects.update(age=42)
+        assert rows == 2
+        changed = ctx.captured_queries[3]["sql"]
+        assert str(self.human2.pk) in changed
+        assert str(self.human.pk) not in changed.split("IN")[-1]
+        event = TrackingEvent.objects.get(action=UPDATE)
+        assert event.object_id == self.human2.pk
+
+    @mock.patch("tracking_fields.tracking.UPDATE_CHUNK_SIZE", 1)
+    def test_update_chunks(self):
+        with CaptureQueriesContext(connection) as ctx:
+            Human.objects.update(age=60)
+        # Select the values before, update, then select the values and the
+        # changed object, insert the event and field for each human
+        assert len(ctx.captured_queries) == 2 + 2 * 4
+        assert TrackingEvent.objects.filter(action=UPDATE).count() == 2
+
+    def test_update_expression(self):
+        Human.objects.update(age=F("age") + 1)
+        events = TrackingEvent.objects.filter(action=UPDATE)
+        assert events.count() == 2
+        field = events.get(object_id=self.human2.pk).fields.get()
+        assert field.old_value == json.dumps(21)
+        assert field.new_value == json.dumps(22)
+
+    def test_update_foreign_key(self):
+        Human.objects.filter(pk=self.human.pk).update(favourite_pet=self.pet)
+        Human.objects.filter(pk=self.human.pk).update(favourite_pet_id=self.pet2.pk)
+        event = TrackingEvent.objects.filter(
+            action=UPDATE, object_content_type__model="human"
+        ).order_by("date")
+        field = event.last().fields.get()
+        assert field.field == "favourite_pet"
+        assert field.old_value == json.dumps(str(self.pet))
+        assert field.new_value == json.dumps(str(self.pet2))
+
+    def test_update_related(self):
+        Human.objects.filter(pk=self.human.pk).update(name="Tutu")
+        house_event = TrackingEvent.objects.get(object_content_type__model="house")
+        field = house_event.fields.get()
+        assert field.field == "tenant__name"
+        assert field.new_value == json.dumps("Tutu")
+
+    def test_update_not_tracked(self):
+        with CaptureQueriesContext(connection) as ctx:
+            Human.objects.update(height=200)
+        assert len(ctx.captured_queries) == 1
+        assert not TrackingEvent.objects.filter(action=UPDATE).exists()
+
+    def test_update_lazy(self):
+        LazyModel.objects.create(value="foo")
+        LazyModel.objects.update(value="bar")
+        field = TrackingEvent.objects.get(action=UPDATE).fields.get()
+        assert field.old_value == json.dumps("foo")
+        assert field.new_value == json.dumps("bar")
+
+    def test_bulk_update(self):
+        self.human.age = 43
+        self.human.name = "Not saved"
+        self.human2.age = 22
+        with CaptureQueriesContext(connection) as ctx:
+            Human.objects.bulk_update([self.human, self.human2], ["age"])
+        inserts = [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith('INSERT INTO "tracking_fields_trackingevent"')
+        ]
+        assert len(inserts) == 1
+        events = TrackingEvent.objects.filter(action=UPDATE)
+        assert events.count() == 2
+        field = events.get(object_id=self.human.pk).fields.get()
+        assert field.field == "age"
+        assert field.old_value == json.dumps(42)
+        assert field.new_value == json.dumps(43)
+        # Only the saved fields are reset
+        self.human.save()
+        event = TrackingEvent.objects.filter(object_content_type__model="human")
+        field = event.order_by("date").last().fields.get()
+        assert field.field == "name"
+
+    def test_bulk_update_lazy(self):
+        LazyModel.objects.create(value="foo")
+        model = LazyModel.objects.get()
+        model.value = "bar"
+        LazyModel.objects.bulk_update([model], ["value"])
+        model.save()
+        field = TrackingEvent.objects.get(action=UPDATE).fields.get()
+        assert field.old_value == json.dumps("foo")
+        assert field.new_value == json.dumps("bar")
+
+
+class DeferredTrackingTestCase(TestCase):
+    def setUp(self):
+        self.human = Human.objects.create(name="George", age=42, height=175)
+        self.pet = Pet.objects.create(name="Catz", age=12)
+
+    def _count_inserts(self, ctx):
+        return len(
+            [
+                query
+                for query in ctx.captured_queries
+                if query["sql"].startswith('INSERT INTO "tracking_fields_trackingevent"')
+            ]
+        )
+
+    @override_settings(TRACKING_FIELDS_DEFER_WRITES=True)
+    def test_written_on_commit(self):
+        with CaptureQueriesContext(connection) as commit_ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                with CaptureQueriesContext(connection) as ctx:
+                    self.human.age = 43
+                    self.human.save()
+                    self.pet.age = 13
+                    self.pet.save()
+                assert TrackingEvent.objects.filter(action=UPDATE).count() == 0
+        assert self._count_inserts(ctx) == 0
+        assert self._count_inserts(commit_ctx) == 1
+        events = TrackingEvent.objects.filter(action=UPDATE)
+        assert events.count() == 2
+        field = events.get(object_content_type__model="human").fields.get()
+        assert field.old_value == json.dumps(42)
+        assert field.new_value == json.dumps(43)
+
+    @override_settings(TRACKING_FIELDS_DEFER_WRITES=True)
+    def test_rollback(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.human.age = 43
+            self.human.save()
+            try:
+                with transaction.atomic():
+                    self.pet.age = 13
+                    self.pet.save()
+                    raise ValueError
+            except ValueError:
+                pass
+            self.human.name = "Toto"
+            self.human.save()
+        events = TrackingEvent.objects.filter(action=UPDATE)
+        assert events.count() == 2
+        assert not events.filter(object_content_type__model="pet").exists()
+
+    @override_settings(TRACKING_FIELDS_DEFER_WRITES=True)
+    def test_nested_savepoints(self):
+        """Events of released savepoints are written with their parent's"""
+        with CaptureQueriesContext(connection) as commit_ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                with CaptureQueriesContext(connection) as ctx:
+                    with transaction.atomic():
+                        for i in range(50):
+                            with transaction.atomic():
+                                self.human.age = i
+                                self.human.save()
+                        try:
+                            with transaction.atomic():
+                                self.pet.age = 13
+                                self.pet.save()
+                                raise ValueError
+                        except ValueError:
+                            pass
+                        self.human.name = "Toto"
+                        self.human.save()
+        assert self._count_inserts(ctx) == 0
+        assert self._count_inserts(commit_ctx) == 1
+        events = TrackingEvent.objects.filter(action=UPDATE)
+        assert events.count() == 51
+        assert not events.filter(object_content_type__model="pet").exists()
+
+    @override_settings(TRACKING_FIELDS_DEFER_WRITES=True)
+    def test_sibling_savepoints(self):
+        """Events of savepoints without later events in their parent are
+        written by savepoint"""
+        with CaptureQueriesContext(connection) as commit_ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    for i in range(3):
+                        with transaction.atomic():
+                            self.human.age = i
+                            self.human.save()
+                    try:
+                        with transaction.atomic():
+                            self.pet.age = 13
+                            self.pet.save()
+                            raise ValueError
+                    except ValueError:
+                        pass
+        assert self._count_inserts(commit_ctx) == 3
+        events = TrackingEvent.objects.filter(action=UPDATE)
+        assert events.count() == 3
+        assert not events.filter(object_content_type__model="pet").exists()
+
+    @override_settings(TRACKING_FIELDS_DEFER_WRITES=True)
+    def test_unchanged_save_not_buffered(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.human.save()
+        assert not callbacks
+
+    def test_not_deferred_by_default(self):
+        self.human.age = 43
+        self.human.save()
+        assert TrackingEvent.objects.filter(action=UPDATE).count() == 1
+
+    def test_defer_tracking(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with defer_tracking():
+                self.human.age = 43
+                self.human.save()
+                self.pet.age = 13
+                self.pet.save()
+                self.human.pets.add(self.pet)
+                assert TrackingEvent.objects.filter(action=UPDATE).count() == 0
+        assert self._count_inserts(ctx) == 1
+        assert TrackingEvent.objects.filter(action=UPDATE).count() == 2
+        assert TrackingEvent.objects.filter(action=ADD).count() == 1
+
+    def test_defer_tracking_rollback(self):
+        with defer_tracking():
+            self.human.age = 43
+            self.human.save()
+            try:
+                with transaction.atomic():
+                    self.pet.age = 13
+                    self.pet.save()
+                    raise ValueError
+            except ValueError:
+                pass
+        events = TrackingEvent.objects.filter(action=UPDATE)
+        assert events.count() == 1
+        assert events.get().object == self.human
+
+    @override_settings(TRACKING_FIELDS_COALESCE_UPDATES=True)
+    def test_coalesce(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.human.age = 43
+            self.human.save()
+            self.human.name = "Toto"
+            self.human.save()
+            self.pet.age = 13
+            self.pet.save()
+            self.human.age = 44
+            self.human.save()
+            self.human.name = "George"
+            self.human.save()
+            assert TrackingEvent.objects.filter(action=UPDATE).count() == 0
+        events = TrackingEvent.objects.filter(action=UPDATE)
+        assert events.count() == 2
+        field = events.get(object_content_type__model="human").fields.get()
+        assert field.field == "age"
+        assert field.old_value == json.dumps(42)
+        assert field.new_value == json.dumps(44)
+        assert events.get(object_content_type__model="pet").fields.count() == 1
+
+    @override_settings(TRACKING_FIELDS_COALESCE_UPDATES=True)
+    def test_coalesce_nested_savepoints(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for age in (43, 44, 45):
+                    with transaction.atomic():
+                        self.human.age = age
+                        self.human.save()
+                self.pet.age = 13
+                self.pet.save()
+        event = TrackingEvent.objects.get(
+            action=UPDATE, object_content_type__model="human"
+        )
+        field = event.fields.get()
+        assert field.old_value == json.dumps(42)
+        assert field.new_value == json.dumps(45)
+
+    @override_settings(TRACKING_FIELDS_COALESCE_UPDATES=True)
+    def test_coalesce_no_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.human.age = 43
+            self.human.save()
+            self.human.age = 42
+            self.human.save()
+        assert not TrackingEvent.objects.filter(action=UPDATE).exists()
+
+    @override_settings(TRACKING_FIELDS_COALESCE_UPDATES=True)
+    def test_coalesce_defer_tracking(self):
+        with defer_tracking():
+            self.human.age = 43
+            self.human.save()
+            # Without savepoint, rolled back with the block
+            with transaction.atomic(savepoint=False):
+                self.human.age = 44
+                self.human.save()
+            self.human.delete()
+        update = TrackingEvent.objects.get(action=UPDATE)
+        assert update.fields.get().new_value == json.dumps(44)
+        assert TrackingEvent.objects.filter(action=DELETE).exists()
+
+
+@override_settings(TRACKING_FIELDS_DEFER_WRITES=True)
+class DeferredTrackingTransactionTestCase(TransactionTestCase):
+    def test_rollback_then_commit(self):
+        try:
+            with transaction.atomic():
+                Pet.objects.create(name="Catz", age=12)
+                raise ValueError
+        except ValueError:
+            pass
+        with transaction.atomic():
+            Pet.objects.create(name="Garfield", age=4)
+        event = TrackingEvent.objects.get()
+        assert event.object_repr == repr(Pet.objects.get())
+
+
+class AsyncTrackingWriterTestCase(TestCase):
+    def setUp(self):
+        self.batches = []
+
+    def write(self, events, tracked_fields):
+        self.batches.append((events, tracked_fields))
+
+    def test_batches(self):
+        writer = AsyncTrackingWriter(batch_size=2, flush_interval=10, write=self.write)
+        writer.put(["event1"], ["field1"])
+        writer.put(["event2", "event3"], ["field2", "field3"])
+        writer.put(["event4"], [])
+        writer.start()
+        writer.shutdown()
+        assert self.batches == [
+            (["event1", "event2", "event3"], ["field1", "field2", "field3"]),
+            (["event4"], []),
+        ]
+
+    def test_flush_interval(self):
+        writer = AsyncTrackingWriter(flush_interval=0.01, write=self.write)
+        writer.start()
+        writer.put(["event1"], [])
+        # Written without waiting for the batch to be full or the shutdown
+        for _i in range(100):
+            if self.batches:
+                break
+            time.sleep(0.01)
+        assert self.batches == [(["event1"], [])]
+        writer.shutdown()
+
+    def test_drop_when_full(self):
+        writer = AsyncTrackingWriter(queue_size=1, block=False, write=self.write)
+        assert writer.put(["event1"], [])
+        assert not writer.put(["event2", "event3"], [])
+        assert writer.dropped == 2
+        writer.start()
+        writer.shutdown()
+        assert self.batches == [(["event1"], [])]
+
+    def test_write_errors_are_logged(self):
+        def write(events, tracked_fields):
+            raise ValueError
+
+        failures = []
+        writer = AsyncTrackingWriter(
+            write=write,
+            retries=2,
+            retry_delay=0,
+            on_failure=lambda *args: failures.append(args),
+        )
+        writer.put(["event1"], [])
+        writer.start()
+        with self.assertLogs("tracking_fields.writer", level="WARNING") as logs:
+            writer.shutdown()
+        assert [record.levelname for record in logs.records] == [
+            "WARNING",
+            "WARNING",
+            "WARNING",
+            "ERROR",
+        ]
+        assert writer.failed == 1
+        assert len(failures) == 1
+        assert failures[0][:2] == (["event1"], [])
+        assert isinstance(failures[0][2], ValueError)
+
+    def test_write_retried(self):
+        def write(events, tracked_fields):
+            if not attempts:
+                attempts.append(events)
+                raise ValueError
+            self.write(events, tracked_fields)
+
+        attempts = []
+        writer = AsyncTrackingWriter(write=write, retry_delay=0)
+        writer.put(["event1"], [])
+        writer.start()
+        with self.assertLogs("tracking_fields.writer", level="WARNING"):
+            writer.shutdown()
+        assert self.batches == [(["event1"], [])]
+        assert writer.failed == 0
+
+    def test_setting(self):
+        assert get_writer() is None
+        with override_settings(TRACKING_FIELDS_ASYNC_WRITER={"WORKERS": 2}):
+            writer = get_writer()
+            assert len(writer.threads) == 2
+            assert get_writer() is writer
+        assert not writer.threads
+        assert get_writer() is None
+
+
+@override_settings(TRACKING_FIELDS_ASYNC_WRITER={"FLUSH_INTERVAL": 0.01})
+class AsyncTrackingWriterDatabaseTestCase(TransactionTestCase):
+    def tearDown(self):
+        shutdown_writer()
+
+    def test_write(self):
+        pet = Pet.objects.create(name="Catz", age=12)
+        with transaction.atomic():
+            pet.age = 13
+            pet.save()
+        shutdown_writer()
+        events = TrackingEvent.objects.filter(object_content_type__model="pet")
+        assert events.count() == 2
+        field = events.get(action=UPDATE).fields.get()
+        assert field.old_value == json.dumps(12)
+        assert field.new_value == json.dumps(13)
+
+    def test_rollback(self):
+        try:
+            with transaction.atomic():
+                Pet.objects.create(name="Catz", age=12)
+                raise ValueError
+        except ValueError:
+            pass
+        shutdown_writer()
+        assert not Pet.objects.exists()
+        assert not TrackingEvent.objects.exists()
+
+    def test_defer_tracking_rollback(self):
+        try:
+            with defer_tracking():
+                Pet.objects.create(name="Catz", age=12)
+                raise ValueError
+        except ValueError:
+            pass
+        shutdown_writer()
+        assert not TrackingEvent.objects.exists()
+
+
+class TrackingPlanTestCase(TestCase):
+    def test_plan(self):
+        plan = Human._tracking_plan
+        assert plan.fields == (
+            ("birthday", "birthday"),
+            ("name", "name"),
+            ("age", "age"),
+            ("favourite_pet", "favourite_pet_id"),
+        )
+        assert plan.m2m_fields == {"pets"}
+        assert plan.fk_fields["favourite_pet"] is Pet
+        assert plan.through_fields[Human.pets.through] == "pets"
+        assert plan.related_m2m_fields["pets"] == (("tenant", "house"),)
+        assert ("name", "name", (("tenant", "house"),)) in plan.related_fields
+
+    def test_forward_foreign_key(self):
+        assert ForwardModel._tracking_plan.fk_fields["target"] is ForwardTarget
+        first = ForwardTarget.objects.create(name="First")
+        second = ForwardTarget.objects.create(name="Second")
+        obj = ForwardModel.objects.create(target=first)
+        obj.target = second
+        obj.save()
+        event = TrackingEvent.objects.get(
+            object_content_type__model="forwardmodel", action=UPDATE
+        )
+        field = event.fields.get()
+        assert field.old_value == json.dumps("First")
+        assert field.new_value == json.dumps("Second")
+
+    def test_plan_is_immutable(self):
+        with self.assertRaises(TypeError):
+            Human._tracking_plan.fk_fields["name"] = None
+
+    def test_changes(self):
+        human = Human.objects.create(name="Jean", age=30, height=170)
+        assert _get_changes(human) == Changes((), {})
+        human.name = "Pierre"
+        human.height = 180
+        assert _get_changes(human) == Changes(
+            ("name",), {("tenant", "house"): ["name"]}
+        )
+
+    def test_changes_computed_once(self):
+        human = Human.objects.create(name="Jean", age=30, height=170)
+        human.name = "Pierre"
+        with mock.patch(
+            "tracking_fields.tracking._get_changes", wraps=_get_changes
+        ) as get_changes:
+            human.save()
+        assert get_changes.call_count == 1
+
+
+class TrackingContextTestCase(TestCase):
+    def test_context_manager(self):
+        with tracking_context(
+            correlation_id="job-1", source="import", reason="Nightly import"
+        ) as context:
+            assert get_tracking_context() is context
+            Human.objects.create(name="George", age=42, height=175)
+            Pet.objects.create(name="Catz", age=12)
+        assert get_tracking_context() is None
+        context = TrackingContext.objects.get()
+        assert context.correlation_id == "job-1"
+        assert context.source == "import"
+        assert context.reason == "Nightly import"
+        assert str(context) == "import - Nightly import - job-1"
+        assert context.events.count() == 2
+        Pet.objects.create(name="Garfield", age=4)
+        assert TrackingEvent.objects.filter(context=None).count() == 1
+
+    def test_nested(self):
+        with tracking_context(source="outer") as outer:
+            with tracking_context(source="inner") as inner:
+                assert get_tracking_context() is inner
+            assert get_tracking_context() is outer
+
+    def test_decorator(self):
+        @tracking_context(source="task")
+        def task(name):
+            return Pet.objects.create(name=name, age=1)
+
+        task("Catz")
+        task("Garfield")
+        assert TrackingContext.objects.filter(source="task").count() == 2
+        assert TrackingEvent.objects.exclude(context=None).count() == 2
+
+    async def test_async_decorator(self):
+        @tracking_context(source="async task")
+        async def task():
+            return get_tracking_context()
+
+        context = await task()
+        assert context.source == "async task"
+        assert get_tracking_context() is None
+
+    def test_written_once(self):
+        with tracking_context(source="batch"):
+            with CaptureQueriesContext(connection) as ctx:
+                with defer_tracking():
+                    for i in range(5):
+                        Pet.objects.create(name="Pet", age=i)
+        inserts = [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith("INSERT")
+            if "tracking_fields_trackingcontext" in query["sql"]
+        ]
+        assert len(inserts) == 1
+        assert TrackingContext.objects.get().events.count() == 5
+
+    def test_written_once_without_deferral(self):
+        with tracking_context(source="batch"):
+            with CaptureQueriesContext(connection) as ctx:
+                for i in range(5):
+                    Pet.objects.create(name="Pet", age=i)
+        inserts = [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith("INSERT")
+            if "tracking_fields_trackingcontext" in query["sql"]
+        ]
+        assert len(inserts) == 1
+        assert TrackingContext.objects.get().events.count() == 5
+
+    def test_written_on_commit(self):
+        with tracking_context(source="batch") as context:
+            with self.captureOnCommitCallbacks(execute=True):
+                Pet.objects.create(name="Catz", age=12)
+                assert not context.written
+            assert context.written
+
+    def test_written_again_after_rollback(self):
+        with tracking_context(source="batch"):
+            try:
+                with transaction.atomic():
+                    Pet.objects.create(name="Catz", age=12)
+                    raise ValueError
+            except ValueError:
+                pass
+            assert not TrackingContext.objects.exists()
+            Pet.objects.create(name="Garfield", age=4)
+        assert TrackingContext.objects.get().events.count() == 1
+
+    def test_retention(self):
+        with tracking_context(source="old"):
+            Pet.objects.create(name="Catz", age=12)
+        TrackingEvent.objects.update(date=timezone.now() - datetime.timedelta(days=40))
+        TrackingContext.objects.update(
+            date=timezone.now() - datetime.timedelta(days=40)
+        )
+        with tracking_context(source="new"):
+            Pet.objects.create(name="Garfield", age=4)
+        call_command("tracking_fields_retention", days=30, stdout=StringIO())
+        assert TrackingContext.objects.get().source == "new"
+
+    def test_delete_orphan_contexts(self):
+        old = timezone.now() - datetime.timedelta(days=40)
+        for i in range(5):
+            with tracking_context(source="old {0}".format(i)):
+                Pet.objects.create(name="Catz", age=i)
+        TrackingContext.objects.update(date=old)
+        TrackingEvent.objects.filter(
+            context__source__in=["old 0", "old 1", "old 2"]
+        ).delete()
+        with CaptureQueriesContext(connection) as ctx:
+            deleted = delete_orphan_contexts(
+                timezone.now() - datetime.timedelta(days=30), batch_size=2
+            )
+        assert deleted == 3
+        assert TrackingContext.objects.count() == 2
+        selects = [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith('SELECT "tracking_fields_trackingcontext"')
+            if "LIMIT 2" in query["sql"]
+        ]
+        # The 5 contexts in 3 batches, then an empty one
+        assert len(selects) == 4
+
+    def test_archive(self):
+        with tracking_context(correlation_id="job-1", source="old"):
+            Pet.objects.create(name="Catz", age=12)
+        date = datetime.datetime(2024, 1, 31, 12, tzinfo=datetime.timezone.utc)
+        TrackingEvent.objects.update(date=date)
+        TrackingContext.objects.update(date=date)
+        context = TrackingContext.objects.get()
+        with tempfile.TemporaryDirectory() as directory:
+            call_command("tracking_fields_archive", directory, days=1, stdout=StringIO())
+            assert not TrackingContext.objects.exists()
+            path = os.path.join(directory, "tracking_events_2024-01.jsonl.gz")
+            assert next(read_archive(path))["context"]["id"] == str(context.pk)
+            restore_archive(path)
+        event = TrackingEvent.objects.get()
+        assert event.context == context
+        assert event.context.correlation_id == "job-1"
+
+
+class RetentionTestCase(TestCase):
+    def setUp(self):
+        self.pet = Pet.objects.create(name="Catz", age=12)
+        for i in range(4):
+            self.pet.age = i
+            self.pet.save()
+        TrackingEvent.objects.update(date=timezone.now() - datetime.timedelta(days=40))
+        self.human = Human.objects.create(name="George", age=42, height=175)
+
+    def test_delete_events(self):
+        before = timezone.now() - datetime.timedelta(days=30)
+        with CaptureQueriesContext(connection) as ctx:
+            deleted = delete_events(before, batch_size=2)
+        assert deleted == 5
+        deletes = [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith('DELETE FROM "tracking_fields_trackingevent"')
+        ]
+        assert len(deletes) == 3
+        assert TrackingEvent.objects.get().object == self.human
+        assert TrackedFieldModification.objects.exclude(
+            event__object_id=self.human.pk
+        ).count() == 0
+
+    def test_modification_date(self):
+        tracked_fields = TrackedFieldModification.objects.filter(
+            event__object_content_type__model="human"
+        ).select_related("event")
+        for tracked_field in tracked_fields:
+            assert tracked_field.date == tracked_field.event.date
+
+    def test_delete_orphan_modifications(self):
+        before = timezone.now() - datetime.timedelta(days=30)
+        old_events = TrackingEvent.objects.filter(date__lt=before)
+        TrackedFieldModification.objects.filter(event__in=old_events).update(
+            date=timezone.now() - datetime.timedelta(days=40)
+        )
+        # As when the partition of the events is dropped
+        old_events._raw_delete(old_events.db)
+        human_fields = TrackedFieldModification.objects.filter(
+            event__object_content_type__model="human"
+        ).count()
+        with CaptureQueriesContext(connection) as ctx:
+            deleted = delete_orphan_modifications(before, batch_size=3)
+        assert deleted == 8
+        assert TrackedFieldModification.objects.count() == human_fields
+        selects = [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith('SELECT "tracking_fields_trackedfieldmodification"')
+        ]
+        assert len(selects) == 4
+
+    def test_command(self):
+        out = StringIO()
+        call_command("tracking_fields_retention", days=30, stdout=out)
+        assert out.getvalue() == "Deleted 5 events\n"
+        assert TrackingEvent.objects.count() == 1
+        with self.assertRaises(CommandError):
+            call_command("tracking_fields_retention")
+
+    @override_settings(TRACKING_FIELDS_RETENTION_DAYS=50)
+    def test_command_setting(self):
+        call_command("tracking_fields_retention", stdout=StringIO())
+        assert TrackingEvent.objects.count() == 6
+
+    def test_create_partitions_not_partitioned(self):
+        assert not is_partitioned()
+        with self.assertRaises(CommandError):
+            call_command("tracking_fields_create_partitions")
+
+    def test_parse_partition_bound(self):
+        start, end = parse_partition_bound(
+            "FOR VALUES FROM ('2024-01-01 00:00:00+00') TO ('2024-02-01 00:00:00+00')"
+        )
+        assert start == datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        assert end == datetime.datetime(2024, 2, 1, tzinfo=datetime.timezone.utc)
+        assert parse_partition_bound("DEFAULT") is None
+
+
+class ArchiveTestCase(TestCase):
+    def setUp(self):
+        self.pet = Pet.objects.create(name="Catz", age=12)
+        TrackingEvent.objects.update(
+            date=datetime.datetime(2024, 1, 31, 11, tzinfo=datetime.timezone.utc)
+        )
+        self.pet.age = 13
+        self.pet.save()
+        TrackingEvent.objects.filter(action=UPDATE).update(
+            date=datetime.datetime(2024, 1, 31, 12, tzinfo=datetime.timezone.utc)
+        )
+        self.pet.age = 14
+        self.pet.save()
+        TrackingEvent.objects.filter(
+            date__gt=datetime.datetime(2024, 2, 1, tzinfo=datetime.timezone.utc)
+        ).update(date=datetime.datetime(2024, 2, 1, 12, tzinfo=datetime.timezone.utc))
+        self.human = Human.objects.create(name="George", age=42, height=175)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_archive(self):
+        before = timezone.now() - datetime.timedelta(days=1)
+        paths, count = archive_events(self.directory.name, before, batch_size=1)
+        assert count == 3
+        assert [os.path.basename(path) for path in paths] == [
+            "tracking_events_2024-01.jsonl.gz",
+            "tracking_events_2024-02.jsonl.gz",
+        ]
+        events = list(read_archive(paths[0]))
+        assert [event["action"] for event in events] == [CREATE, UPDATE]
+        assert events[1]["object_content_type"] == "tests.pet"
+        assert events[1]["object_id"] == self.pet.pk
+        field = TrackedFieldModification.objects.get(new_value="13")
+        assert events[1]["fields"] == [
+            {
+                "id": str(field.pk),
+                "field": "age",
+                "old_value": "12",
+                "new_value": "13",
+            }
+        ]
+
+    def test_command_and_restore(self):
+        out = StringIO()
+        call_command("tracking_fields_archive", self.directory.name, days=1, stdout=out)
+        assert "Archived 3 events" in out.getvalue()
+        assert TrackingEvent.objects.get().object == self.human
+        path = os.path.join(self.directory.name, "tracking_events_2024-01.jsonl.gz")
+        call_command("tracking_fields_restore_archive", path, stdout=StringIO())
+        assert restore_archive(path) == 2
+        event = TrackingEvent.objects.get(action=UPDATE)
+        assert event.object == self.pet
+        assert event.date == datetime.datetime(
+            2024, 1, 31, 12, tzinfo=datetime.timezone.utc
+        )
+        field = event.fields.get()
+        assert field.old_value == "12"
+
+
+class JsonValuesTestCase(TestCase):
+    @override_settings(TRACKING_FIELDS_JSON_VALUES=True)
+    def test_json_values(self):
+        pet = Pet.objects.create(name="Catz", age=12)
+        pet.age = 13
+        pet.save()
+        field = TrackedFieldModification.objects.get(new_value_json=13)
+        assert field.old_value_json == 12
+        assert TrackedFieldModification.objects.filter(new_value_json="Catz").exists()
+
+    def test_convert_command(self):
+        pet = Pet.objects.create(name="Catz", age=12)
+        pet.age = 13
+        pet.save()
+        assert not TrackedFieldModification.objects.filter(
+            new_value_json__isnull=False
+        ).exists()
+        out = StringIO()
+        call_command("tracking_fields_convert_json_values", batch_size=2, stdout=out)
+        # The null values of the creation are converted once
+        assert out.getvalue() == "Converted {0} modifications\n".format(
+            TrackedFieldModification.objects.count()
+        )
+        field = TrackedFieldModification.objects.get(new_value_json=13)
+        assert field.old_value_json == 12
+
+
+class SerializersTestCase(TestCase):
+    def test_types(self):
+        assert serialize(datetime.time(12, 30, 15)) == json.dumps("12:30:15")
+        assert serialize(datetime.date(2024, 1, 31)) == json.dumps("2024-01-31")
+        assert serialize(
+            datetime.datetime(2024, 1, 31, 12, 30, 15)
+        ) == json.dumps("2024-01-31 12:30:15")
+        value = uuid.uuid4()
+        assert serialize(value) == json.dumps(str(value))
+        assert serialize("é") == '"é"'
+        # The format of the values stored by previous versions is kept
+        assert serialize({"value": [1, 2]}) == '{"value": [1, 2]}'
+
+    def test_register(self):
+        class Money:
+            def __init__(self, amount):
+                self.amount = amount
+
+        assert serialize(Money(3)).startswith('"<')
+
+        @to_json.register(Money)
+        def _(value):
+            return value.amount
+
+        assert serialize(Money(3)) == "3"
+
+    @override_settings(TRACKING_FIELDS_JSON_BACKEND="orjson")
+    def test_orjson(self):
+        assert serialize(datetime.time(12, 30, 15)) == json.dumps("12:30:15")
+        assert serialize({"value": "é"}) == '{"value":"é"}'
+        assert serialize(2**70) == str(2**70)
+        pet = Pet.objects.create(name="Catz", age=12)
+        field = TrackedFieldModification.objects.get(
+            event__object_id=pet.pk, field="name"
+        )
+        assert field.new_value == json.dumps("Catz")
+
 
 class AdminModelTestCase(TestCase):
     @classmethod
@@ -487,6 +1920,175 @@ class AdminModelTestCase(TestCase):
             escape(repr(self.human)),
         )
 
+    def test_user_filter_queries(self):
+        """Test the users of the filter are fetched with one query."""
+        user_content_type = ContentType.objects.get_for_model(User)
+        for i in range(5):
+            user = User.objects.create_user(username="user{0}".format(i))
+            TrackingEvent.objects.create(
+                action="UPDATE",
+                object=self.human,
+                object_repr=repr(self.human),
+                user=user,
+                user_repr=repr(user),
+            )
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.c.get("/admin/tracking_fields/trackingevent/")
+        self.assertContains(response, "user4")
+        user_queries = [
+            query
+            for query in ctx.captured_queries
+            if 'FROM "auth_user"' in query["sql"]
+        ]
+        # Logged in user and filter
+        assert len(user_queries) == 2
+        response = self.c.get(
+            f"/admin/tracking_fields/trackingevent/"
+            f"?user={user_content_type.id}:{user.id}"
+        )
+        assert len(response.context["cl"].result_list) == 1
+
+    @override_settings(
+        TRACKING_FIELDS_USER_FILTER_CACHE_TIMEOUT=60,
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        },
+    )
+    def test_user_filter_cache(self):
+        """Test the users of the filter can be cached."""
+        self.c.get("/admin/tracking_fields/trackingevent/")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.c.get("/admin/tracking_fields/trackingevent/")
+        self.assertContains(response, "admin")
+        assert not [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith(
+                'SELECT DISTINCT "tracking_fields_trackingevent"."user_content_type_id"'
+            )
+        ]
+        request = RequestFactory().get("/")
+        model_admin = admin.site._registry[TrackingEvent]
+        user_filter = TrackerEventUserSearchFilter(
+            request, {}, TrackingEvent, model_admin
+        )
+        queryset = TrackingEvent.objects.all()
+        assert user_filter.get_cache_key(queryset) == user_filter.get_cache_key(
+            TrackingEvent.objects.all()
+        )
+        assert user_filter.get_cache_key(queryset) != user_filter.get_cache_key(
+            queryset.filter(action="UPDATE")
+        )
+
+    def test_user_search_filter(self):
+        """Test the search filter on users."""
+        other = User.objects.create_user(username="other")
+        TrackingEvent.objects.create(
+            action="UPDATE",
+            object=self.human,
+            object_repr=repr(self.human),
+            user=other,
+            user_repr="renamed",
+        )
+        request = RequestFactory().get("/")
+        model_admin = admin.site._registry[TrackingEvent]
+        user_filter = TrackerEventUserSearchFilter(
+            request, {"user": ["othe"]}, TrackingEvent, model_admin
+        )
+        assert user_filter.has_output()
+        events = user_filter.queryset(request, TrackingEvent.objects.all())
+        assert [event.user for event in events] == [other]
+        user_content_type = ContentType.objects.get_for_model(User)
+        user_filter = TrackerEventUserSearchFilter(
+            request,
+            {"user": ["{0}:{1}".format(user_content_type.pk, self.user.pk)]},
+            TrackingEvent,
+            model_admin,
+        )
+        events = user_filter.queryset(request, TrackingEvent.objects.all())
+        assert {event.user for event in events} == {self.user}
+
+    def test_user_search_filter_template(self):
+        """Test the markup of the search filter on users."""
+        request = RequestFactory().get("/", {"action": "UPDATE"})
+        model_admin = admin.site._registry[TrackingEvent]
+        user_filter = TrackerEventUserSearchFilter(
+            request, {"user": ["othe"]}, TrackingEvent, model_admin
+        )
+        context = {
+            "title": user_filter.title,
+            "choices": [{"value": "othe", "params": [("action", "UPDATE")]}],
+            "spec": user_filter,
+        }
+        html = render_to_string(user_filter.template, context)
+        assert ("<details" in html) == (django.VERSION >= (5, 0))
+        self.assertInHTML(
+            '<input type="search" name="user" value="othe" placeholder="Search">',
+            html,
+        )
+        with mock.patch.object(TrackerEventUserSearchFilter, "collapsible", False):
+            html = render_to_string(user_filter.template, context)
+        assert "<details" not in html
+        assert "<h3>" in html
+
+    @override_settings(TRACKING_FIELDS_ADMIN_KEYSET_PAGINATION=True)
+    def test_keyset_pagination(self):
+        """Test the admin view listing the objects by keyset pages."""
+        for i in range(4):
+            Pet.objects.create(name="Pet {0}".format(i), age=i)
+        url = "/admin/tracking_fields/trackingevent/"
+        with mock.patch.object(TrackingEventAdmin, "list_per_page", 2):
+            events = []
+            response = self.c.get(url)
+            while True:
+                cl = response.context["cl"]
+                assert cl.result_count == 5
+                events.extend(cl.result_list)
+                if cl.next_page_url is None:
+                    break
+                self.assertContains(response, "Next page")
+                response = self.c.get(url + cl.next_page_url)
+                self.assertContains(response, "First page")
+        assert events == list(TrackingEvent.objects.order_by("-date", "-pk"))
+        response = self.c.get(url + "?action=CREATE&after=foo")
+        assert response.status_code == 302
+        assert response["Location"].endswith("?e=1")
+
+    @override_settings(TRACKING_FIELDS_ADMIN_KEYSET_PAGINATION=True)
+    def test_lazy_date_hierarchy(self):
+        """Test the date hierarchy does not aggregate the events."""
+        year = timezone.now().year
+        url = "/admin/tracking_fields/trackingevent/"
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.c.get(url)
+        assert not [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith("SELECT DISTINCT django_datetime_trunc")
+        ]
+        self.assertContains(response, "?date__year={0}".format(year))
+        response = self.c.get(url + "?date__year={0}".format(year))
+        self.assertContains(response, "date__month=12")
+        response = self.c.get(url + "?date__month=2&date__year={0}".format(year))
+        self.assertContains(response, "date__day=28")
+
+    def test_list_queries(self):
+        """Test the objects of the events are fetched by content type."""
+        for i in range(5):
+            Pet.objects.create(name="Pet {0}".format(i), age=i)
+            human = Human.objects.create(
+                name="Human {0}".format(i), age=i, height=150
+            )
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.c.get("/admin/tracking_fields/trackingevent/")
+        self.assertContains(response, '<td class="field-object">{0}</td>'.format(human))
+        object_queries = [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith(('SELECT "tests_pet"', 'SELECT "tests_human"'))
+        ]
+        assert len(object_queries) == 2
+
     def test_single(self):
         """Test the admin view listing all objects."""
         event = TrackingEvent.objects.first()
@@ -528,6 +2130,30 @@ class AdminModelTestCase(TestCase):
             ' class="historylink">{0}</a>'.format(self.human),
         )
 
+    def test_object_filter_does_not_list_objects(self):
+        """Test the object filter does not get the objects of all the events."""
+        content_type = ContentType.objects.get(app_label="tests", model="human")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.c.get(
+                "/admin/tracking_fields/trackingevent/?object={0}:{1}".format(
+                    content_type.pk, self.human.pk
+                )
+            )
+        self.assertContains(response, escape(repr(self.human)))
+        assert not [
+            query
+            for query in ctx.captured_queries
+            if query["sql"].startswith(
+                'SELECT "tracking_fields_trackingevent"."object_content_type_id"'
+            )
+        ]
+
+    def test_list_with_incorrect_object_filter(self):
+        """Test the admin view listing all objects with incorrect object filter."""
+        response = self.c.get("/admin/tracking_fields/trackingevent/?object=foo:1:2")
+        self.assertContains(response, escape(repr(self.human)))
+        self.assertNotContains(response, ' class="historylink">')
+
     def test_history_back_btn_is_not_present(self):
         """
         Test the button back to the button is not present
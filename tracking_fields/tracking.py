@@ -1,22 +1,18 @@
 from __future__ import unicode_literals
 
-import datetime
 import json
-import logging
 import uuid
+from collections import namedtuple
 
-from tracking_fields.middleware.cuser import CuserMiddleware
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import ManyToManyField, Model
-from django.db.models.fields.files import FieldFile
-from django.db.models.fields.related import ForeignKey
-
-try:
-    from xworkflows.base import StateWrapper
-except ImportError:
-    StateWrapper = type("StateWrapper", (object,), dict())
+from django.db.models.query_utils import DeferredAttribute
+from django.db.models.signals import post_migrate, post_save
 
+from tracking_fields.buffer import buffer_events
+from tracking_fields.context import get_tracking_context
+from tracking_fields.middleware.cuser import CuserMiddleware
 from tracking_fields.models import (
     CREATE,
     DELETE,
@@ -24,134 +20,247 @@ from tracking_fields.models import (
     TrackedFieldModification,
     TrackingEvent,
 )
+from tracking_fields.serializers import serialize
+from tracking_fields.writer import write_events
 
-logger = logging.getLogger(__name__)
+# Maximum number of related objects representations cached during a request
+FK_REPRS_CACHE_SIZE = 1000
+
+# Number of objects compared at once after a ``QuerySet.update``
+UPDATE_CHUNK_SIZE = 1000
+
+# Model to the id of its content type
+_content_type_ids = {}
 
 
 # ======================= HELPERS ====================
 
 
-def _set_original_fields(instance):
+class TrackedFieldDescriptor:
     """
-    Save fields value, only for non-m2m fields.
+    Wrap the descriptor of a field tracked lazily.
+    The current value of the field is stored as original value the first time
+    the field is modified. Values set while the object is initialized or when
+    a deferred field is loaded are not stored.
+
+    As it defines ``__set__``, the wrapper takes precedence over the instance
+    dict on each read, so the loaded values are read from the instance dict
+    first, unless the wrapped descriptor computes the value itself.
     """
-    original_fields = {}
 
-    def _set_original_field(instance, field):
-        if instance.pk is None:
-            original_fields[field] = None
+    def __init__(self, field, attname, descriptor):
+        self.field = field
+        self.attname = attname
+        self.descriptor = descriptor
+        self.read_dict = type(descriptor).__get__ is DeferredAttribute.__get__
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self.descriptor
+        if self.read_dict:
+            try:
+                return instance.__dict__[self.attname]
+            except KeyError:
+                # Deferred field
+                pass
+        return self.descriptor.__get__(instance, cls)
+
+    def __set__(self, instance, value):
+        data = instance.__dict__
+        if self.attname in data:
+            original_fields = data.setdefault("_original_fields", {})
+            if self.field not in original_fields:
+                original_fields[self.field] = data[self.attname]
+        if hasattr(self.descriptor, "__set__"):
+            self.descriptor.__set__(instance, value)
         else:
-            if isinstance(instance._meta.get_field(field), ManyToManyField):
-                # Do not store M2M manager as we won't use them
-                return
-            elif isinstance(instance._meta.get_field(field), ForeignKey):
-                # Do not store deferred fields
-                field_id = f"{field}_id"
-                if field_id not in instance.get_deferred_fields():
-                    # Only get the PK, we don't want to get the object
-                    # (which would make an additional request)
-                    original_fields[field] = getattr(instance, field_id)
-            else:
-                # Do not store deferred fields
-                if field not in instance.get_deferred_fields():
-                    original_fields[field] = getattr(instance, field)
+            data[self.attname] = value
 
-    for field in getattr(instance, "_tracked_fields", []):
-        _set_original_field(instance, field)
-    for field in getattr(instance, "_tracked_related_fields", {}).keys():
-        _set_original_field(instance, field)
+
+def _set_original_fields(instance):
+    """
+    Save fields value, only for non-m2m fields.
+    """
+    plan = instance._tracking_plan
+    if instance.pk is None:
+        original_fields = dict.fromkeys(
+            (field for field, _attname in plan.snapshot_fields), None
+        )
+    else:
+        original_fields = {}
+        deferred_fields = instance.get_deferred_fields()
+        for field, attname in plan.snapshot_fields:
+            # Do not store deferred fields. For foreign keys only get the pk,
+            # we don't want to get the object (which would make an
+            # additional request)
+            if attname not in deferred_fields:
+                original_fields[field] = getattr(instance, attname)
 
     instance._original_fields = original_fields
     # Include pk to detect the creation of an object
     instance._original_fields["pk"] = instance.pk
 
 
-def _has_changed(instance):
+def _set_lazy_original_fields(instance, created):
     """
-    Check if some tracked fields have changed
+    Get the original values stored by ``TrackedFieldDescriptor``.
+    Every field is considered as previously empty for a creation.
     """
-    for field, value in instance._original_fields.items():
-        if field != "pk" and not isinstance(
-            instance._meta.get_field(field), ManyToManyField
-        ):
-            try:
-                if field in getattr(instance, "_tracked_fields", []):
-                    if isinstance(instance._meta.get_field(field), ForeignKey):
-                        if getattr(instance, "{0}_id".format(field)) != value:
-                            return True
-                    else:
-                        if getattr(instance, field) != value:
-                            return True
-            except TypeError:
-                # Can't compare old and new value, should be different.
-                return True
-    return False
-
-
-def _has_changed_related(instance):
-    """
-    Check if some related tracked fields have changed
-    """
-    tracked_related_fields = getattr(instance, "_tracked_related_fields", {}).keys()
-    for field, value in instance._original_fields.items():
-        if field != "pk" and not isinstance(
-            instance._meta.get_field(field), ManyToManyField
-        ):
-            if field in tracked_related_fields:
-                if isinstance(instance._meta.get_field(field), ForeignKey):
-                    if getattr(instance, "{0}_id".format(field)) != value:
-                        return True
-                else:
-                    if getattr(instance, field) != value:
-                        return True
-    return False
-
-
-def _create_event(instance, action):
-    """
-    Create a new event, getting the use if django-cuser is available.
-    """
-    user = CuserMiddleware.get_user()
-    user_repr = repr(user)
-    if user is not None and user.is_anonymous:
-        user = None
-    return TrackingEvent.objects.create(
+    if created:
+        original_fields = dict.fromkeys(
+            (field for field, _attname in instance._tracking_plan.snapshot_fields),
+            None,
+        )
+        original_fields["pk"] = None
+    else:
+        original_fields = instance.__dict__.get("_original_fields", {})
+        original_fields["pk"] = instance.pk
+    instance._original_fields = original_fields
+
+
+def _reset_original_fields(instance):
+    """
+    Reset the original values after a save.
+    """
+    if instance._tracking_plan.lazy:
+        # They will be stored again on the next write
+        del instance._original_fields
+    else:
+        _set_original_fields(instance)
+
+
+# Changes of a save:
+# - fields: names of the changed tracked fields
+# - related: ``related`` tuple (see ``TrackingPlan``) to the names of the
+#   changed fields tracked from this related model
+Changes = namedtuple("Changes", ["fields", "related"])
+
+
+def _get_changes(instance):
+    """
+    Compare the tracked fields to their original values, in one pass over the
+    fields, for all the events of a save.
+    """
+    plan = instance._tracking_plan
+    original_fields = instance._original_fields
+    changed = set()
+    for field, attname in plan.snapshot_fields:
+        if field not in original_fields:
+            continue
+        try:
+            # Foreign keys are compared on their pk
+            if getattr(instance, attname) != original_fields[field]:
+                changed.add(field)
+        except TypeError:
+            # Can't compare old and new value, should be different.
+            changed.add(field)
+    if not changed:
+        return Changes((), {})
+    fields = tuple(field for field, _attname in plan.fields if field in changed)
+    related = {}
+    for field, _attname, related_fields in plan.related_fields:
+        if field in changed:
+            for related_field in related_fields:
+                related.setdefault(related_field, []).append(field)
+    return Changes(fields, related)
+
+
+def _get_content_type_id(model):
+    """
+    Get the id of the content type of a model, cached for the process.
+    """
+    try:
+        return _content_type_ids[model]
+    except KeyError:
+        content_type_id = ContentType.objects.get_for_model(model).pk
+        _content_type_ids[model] = content_type_id
+        return content_type_id
+
+
+def _clear_content_type_ids(**kwargs):
+    # Content types can be created again, e.g. when flushing the database
+    _content_type_ids.clear()
+
+
+post_migrate.connect(_clear_content_type_ids)
+
+
+def _build_event(instance, action):
+    """
+    Build a new event, getting the user if ``CuserMiddleware`` is used and
+    the context if ``tracking_context`` is used.
+    The event is saved later with ``_save_events``.
+    """
+    user_content_type_id, user_id, user_repr = CuserMiddleware.get_user_identity()
+    return TrackingEvent(
         action=action,
-        object_content_type=ContentType.objects.get_for_model(instance),
+        object_content_type_id=_get_content_type_id(instance.__class__),
         object_id=instance.pk if isinstance(instance.pk, int) else None,
         object_repr=repr(instance),
-        user=user,
+        user_content_type_id=user_content_type_id,
+        user_id=user_id,
         user_repr=user_repr,
+        context=get_tracking_context(),
     )
 
 
-def _serialize_field(field):
-    if isinstance(field, datetime.datetime):
-        return json.dumps(field.strftime("%Y-%m-%d %H:%M:%S"), ensure_ascii=False)
-    if isinstance(field, datetime.date):
-        return json.dumps(field.strftime("%Y-%m-%d"), ensure_ascii=False)
-    if isinstance(field, datetime.time):
-        return json.dumps(field.strftime("%H-%M"), ensure_ascii=False)
-    if isinstance(field, FieldFile):
-        try:
-            return json.dumps(field.path, ensure_ascii=False)
-        except ValueError:
-            # No file
-            return json.dumps(None, ensure_ascii=False)
-    if isinstance(field, uuid.UUID):
-        return json.dumps(str(field), ensure_ascii=False)
-    if isinstance(field, Model):
-        return json.dumps(str(field), ensure_ascii=False)
-    if isinstance(field, StateWrapper):
-        return json.dumps(field.name, ensure_ascii=False)
-    try:
-        return json.dumps(field, ensure_ascii=False)
-    except TypeError:
-        logger.warning("Could not serialize field {0}".format(repr(field)))
-        return json.dumps(repr(field), ensure_ascii=False)
+def _get_fk_reprs_cache():
+    """
+    Get the cache of related objects representations.
+    It is kept for the whole request when ``CuserMiddleware`` is used.
+    """
+    cache = CuserMiddleware.get_request_cache()
+    if cache is None:
+        return {}
+    fk_reprs = cache.setdefault("fk_reprs", {})
+    if len(fk_reprs) > FK_REPRS_CACHE_SIZE:
+        fk_reprs.clear()
+    return fk_reprs
+
+
+def _clear_fk_repr(sender, instance, raw=False, **kwargs):
+    """
+    Forget the cached representation of a saved object, which may have
+    changed. Objects changed with ``QuerySet.update`` are not forgotten.
+    """
+    cache = CuserMiddleware.get_request_cache()
+    if not cache or not cache.get("fk_reprs"):
+        return
+    fk_reprs = cache["fk_reprs"]
+    for model in (sender, *sender._meta.get_parent_list()):
+        fk_reprs.pop((model, instance.pk), None)
+
+
+post_save.connect(_clear_fk_repr)
+
+
+def _resolve_fk_reprs(instance, fields, fk_reprs):
+    """
+    Get the representation of the original related objects of the foreign
+    keys in ``fields``, with one query by related model.
+
+    :param instance: The instance on which the fields are
+    :param fields: The field names, fields which are not foreign keys are ignored
+    :param fk_reprs: The dict mapping ``(model, pk)`` to representations to
+        fill, None being used for objects which do not exist anymore.
+    """
+    lookups = {}
+    for field in fields:
+        model = instance._tracking_plan.fk_fields.get(field)
+        if model is None:
+            continue
+        pk = instance._original_fields[field]
+        if pk is not None and (model, pk) not in fk_reprs:
+            lookups.setdefault(model, set()).add(pk)
+    for model, pks in lookups.items():
+        objects = model._base_manager.in_bulk(pks)
+        for pk in pks:
+            obj = objects.get(pk)
+            fk_reprs[(model, pk)] = None if obj is None else str(obj)
+    return fk_reprs
 
 
-def _build_tracked_field(event, instance, field, fieldname=None):
+def _build_tracked_field(event, instance, field, fieldname=None, fk_reprs=None):
     """
     Create a TrackedFieldModification for the instance.
 
@@ -159,86 +268,82 @@ def _build_tracked_field(event, instance, field, fieldname=None):
     :param instance: The instance on which the field is
     :param field: The field name to track
     :param fieldname: The displayed name for the field. Default to field.
+    :param fk_reprs: The representations of the original related objects, as
+        returned by ``_resolve_fk_reprs``. Resolved if not given.
     """
     fieldname = fieldname or field
-    if isinstance(instance._meta.get_field(field), ForeignKey):
-        # We only have the pk, we need to get the actual object
-        model = instance._meta.get_field(field).remote_field.model
-        pk = instance._original_fields[field]
-        try:
-            old_value = model.objects.get(pk=pk)
-        except model.DoesNotExist:
-            old_value = None
+    model = instance._tracking_plan.fk_fields.get(field)
+    if model is not None:
+        # We only have the pk, we need the representation of the object
+        if fk_reprs is None:
+            fk_reprs = _resolve_fk_reprs(instance, [field], {})
+        old_value = fk_reprs.get((model, instance._original_fields[field]))
     else:
         old_value = instance._original_fields[field]
     return TrackedFieldModification(
         event=event,
+        date=event.date,
         field=fieldname,
-        old_value=_serialize_field(old_value),
-        new_value=_serialize_field(getattr(instance, field)),
+        old_value=serialize(old_value),
+        new_value=serialize(getattr(instance, field)),
     )
 
 
-def _create_create_tracking_event(instance):
+def _save_events(events, tracked_fields, using):
     """
-    Create a TrackingEvent and TrackedFieldModification for a CREATE event.
+    Save events and their TrackedFieldModification, or buffer them until the
+    end of the transaction.
+
+    :param using: The database alias on which the tracked changes are made.
     """
-    event = _create_event(instance, CREATE)
+    if not events:
+        return
+    if not buffer_events(events, tracked_fields, using):
+        write_events(events, tracked_fields, using)
+
+
+def _build_create_tracking_event(instance):
+    """
+    Build a TrackingEvent and TrackedFieldModification for a CREATE event.
+    """
+    event = _build_event(instance, CREATE)
     tracked_fields = [
         _build_tracked_field(event, instance, field)
-        for field in instance._tracked_fields
-        if not isinstance(instance._meta.get_field(field), ManyToManyField)
+        for field, _attname in instance._tracking_plan.fields
     ]
-    TrackedFieldModification.objects.bulk_create(tracked_fields)
+    return event, tracked_fields
 
 
-def _create_update_tracking_event(instance):
+def _build_update_tracking_event(instance, fields, fk_reprs):
     """
-    Create a TrackingEvent and TrackedFieldModification for an UPDATE event.
+    Build a TrackingEvent and TrackedFieldModification for an UPDATE event.
+
+    :param fields: The names of the changed fields.
     """
-    event = _create_event(instance, UPDATE)
-    tracked_fields = []
-    for field in instance._tracked_fields:
-        if not isinstance(instance._meta.get_field(field), ManyToManyField):
-            if field not in instance._original_fields:
-                continue
-            try:
-                if isinstance(instance._meta.get_field(field), ForeignKey):
-                    # Compare pk
-                    value = getattr(instance, "{0}_id".format(field))
-                else:
-                    value = getattr(instance, field)
-                if instance._original_fields[field] != value:
-                    tracked_fields.append(_build_tracked_field(event, instance, field))
-            except TypeError:
-                # Can't compare old and new value, should be different.
-                tracked_fields.append(_build_tracked_field(event, instance, field))
-    TrackedFieldModification.objects.bulk_create(tracked_fields)
-
-
-def _create_update_tracking_related_event(instance):
-    """
-    Create a TrackingEvent and TrackedFieldModification for an UPDATE event
+    event = _build_event(instance, UPDATE)
+    _resolve_fk_reprs(instance, fields, fk_reprs)
+    tracked_fields = [
+        _build_tracked_field(event, instance, field, fk_reprs=fk_reprs)
+        for field in fields
+    ]
+    return event, tracked_fields
+
+
+def _build_update_tracking_related_event(instance, related, fk_reprs):
+    """
+    Build a TrackingEvent and TrackedFieldModification for an UPDATE event
     for each related model.
+
+    :param related: The ``related`` tuples to the names of the changed fields,
+        as computed by ``_get_changes``.
     """
-    events = {}
-    # Create a dict mapping related model field to modified fields
-    for field, related_fields in instance._tracked_related_fields.items():
-        if not isinstance(instance._meta.get_field(field), ManyToManyField):
-            if field not in instance._original_fields:
-                continue
-            if isinstance(instance._meta.get_field(field), ForeignKey):
-                # Compare pk
-                value = getattr(instance, "{0}_id".format(field))
-            else:
-                value = getattr(instance, field)
-            if instance._original_fields[field] != value:
-                for related_field in related_fields:
-                    events.setdefault(related_field, []).append(field)
+    _resolve_fk_reprs(
+        instance, {field for fields in related.values() for field in fields}, fk_reprs
+    )
 
-    # Create the events from the events dict
+    related_events = []
     tracked_fields = []
-    for related_field, fields in events.items():
+    for related_field, fields in related.items():
         if related_field[1] == "+":
             continue
         try:
@@ -252,58 +357,171 @@ def _create_update_tracking_related_event(instance):
         else:
             related_instances = [related_instances]
         for related_instance in related_instances:
-            event = _create_event(related_instance, UPDATE)
+            event = _build_event(related_instance, UPDATE)
+            related_events.append(event)
             for field in fields:
                 fieldname = "{0}__{1}".format(related_field[0], field)
                 tracked_fields.append(
-                    _build_tracked_field(event, instance, field, fieldname=fieldname)
+                    _build_tracked_field(
+                        event, instance, field, fieldname=fieldname, fk_reprs=fk_reprs
+                    )
                 )
-    TrackedFieldModification.objects.bulk_create(tracked_fields)
+    return related_events, tracked_fields
+
+
+def _build_save_events(instance, fk_reprs, changes=None):
+    """
+    Build the events of a save, comparing the instance to its original values.
+
+    :param fk_reprs: Cache of the related objects representations, shared by
+        the events of the save to get each related object only once.
+    :param changes: The changes of the instance, as returned by
+        ``_get_changes``. Computed if not given.
+    """
+    if changes is None:
+        changes = _get_changes(instance)
+    events = []
+    tracked_fields = []
+    if changes.fields:
+        if instance._original_fields["pk"] is None:
+            # Create
+            event, fields = _build_create_tracking_event(instance)
+        else:
+            # Update
+            event, fields = _build_update_tracking_event(
+                instance, changes.fields, fk_reprs
+            )
+        events.append(event)
+        tracked_fields.extend(fields)
+    if changes.related:
+        # Because an object need to be saved before being related,
+        # it can only be an update
+        related_events, fields = _build_update_tracking_related_event(
+            instance, changes.related, fk_reprs
+        )
+        events.extend(related_events)
+        tracked_fields.extend(fields)
+    return events, tracked_fields
 
 
-def _create_delete_tracking_event(instance):
+def _build_bulk_update_events(instances, fields):
     """
-    Create a TrackingEvent for a DELETE event.
+    Build the UPDATE events of instances updated in bulk, only comparing
+    ``fields`` to their original value.
     """
-    _create_event(instance, DELETE)
+    fk_reprs = _get_fk_reprs_cache()
+    events = []
+    tracked_fields = []
+    for instance in instances:
+        original_fields = instance.__dict__.get("_original_fields", {})
+        instance._original_fields = {
+            field: original_fields[field]
+            for field in fields
+            if field in original_fields
+        }
+        instance._original_fields["pk"] = instance.pk
+        instance_events, instance_fields = _build_save_events(instance, fk_reprs)
+        events.extend(instance_events)
+        tracked_fields.extend(instance_fields)
+        instance._original_fields = original_fields
+    return events, tracked_fields
+
+
+def _build_delete_tracking_event(instance):
+    """
+    Build a TrackingEvent for a DELETE event.
+    """
+    return _build_event(instance, DELETE)
 
 
 def _get_m2m_field(model, sender):
     """
     Get the field name from a model and a sender from m2m_changed signal.
     """
-    for field in getattr(model, "_tracked_fields", []):
-        if isinstance(model._meta.get_field(field), ManyToManyField):
-            if getattr(model, field).through == sender:
-                return field
-    for field in getattr(model, "_tracked_related_fields", {}).keys():
-        if isinstance(model._meta.get_field(field), ManyToManyField):
-            if getattr(model, field).through == sender:
-                return field
+    return model._tracking_plan.through_fields.get(sender)
 
 
-def _build_tracked_field_m2m(event, instance, field, objects, action, fieldname=None):
-    fieldname = fieldname or field
+def _get_m2m_pk(obj):
+    """
+    Get the primary key of a related object as stored in the compact format.
+    """
+    if isinstance(obj.pk, uuid.UUID):
+        return str(obj.pk)
+    return obj.pk
+
+
+def _get_compact_m2m_values(instance, field, objects, action):
+    """
+    Get the related objects added and removed by ``action``, as JSON
+    objects with their primary keys and, unless ``TRACKING_FIELDS_M2M_REPRS``
+    is False, their representations.
+    Only the current related objects among ``objects`` are fetched, unless
+    they are all prefetched.
+    """
+    manager = getattr(instance, field)
+    prefetched = getattr(instance, "_prefetched_objects_cache", {})
+    added = []
+    removed = []
+    if action == "CLEAR":
+        removed = list(manager.all())
+    elif objects:
+        if manager.prefetch_cache_name in prefetched:
+            current = {obj.pk for obj in manager.all()}
+        else:
+            current = set(
+                manager.filter(pk__in=[obj.pk for obj in objects]).values_list(
+                    "pk", flat=True
+                )
+            )
+        if action == "ADD":
+            added = [obj for obj in objects if obj.pk not in current]
+        else:
+            removed = [obj for obj in objects if obj.pk in current]
+    old_value = {"removed": [_get_m2m_pk(obj) for obj in removed]}
+    new_value = {"added": [_get_m2m_pk(obj) for obj in added]}
+    if getattr(settings, "TRACKING_FIELDS_M2M_REPRS", True):
+        old_value["reprs"] = [str(obj) for obj in removed]
+        new_value["reprs"] = [str(obj) for obj in added]
+    return json.dumps(old_value), json.dumps(new_value)
+
+
+def _get_m2m_values(instance, field, objects, action):
+    """
+    Get the serialized related objects of a m2m field before and after
+    ``action``. The current related objects are taken from the prefetched
+    objects of ``instance`` if any.
+    With ``TRACKING_FIELDS_M2M_FORMAT = "compact"``, only the added and
+    removed objects are serialized.
+    """
+    if getattr(settings, "TRACKING_FIELDS_M2M_FORMAT", "full") == "compact":
+        return _get_compact_m2m_values(instance, field, objects, action)
     before = list(getattr(instance, field).all())
     if action == "ADD":
         after = before + objects
     elif action == "REMOVE":
-        after = [obj for obj in before if obj not in objects]
+        pks = {obj.pk for obj in objects}
+        after = [obj for obj in before if obj.pk not in pks]
     elif action == "CLEAR":
         after = []
     before = list(map(str, before))
     after = list(map(str, after))
+    return json.dumps(before), json.dumps(after)
+
+
+def _build_tracked_field_m2m(event, fieldname, values):
+    old_value, new_value = values
     return TrackedFieldModification(
         event=event,
+        date=event.date,
         field=fieldname,
-        old_value=json.dumps(before),
-        new_value=json.dumps(after),
+        old_value=old_value,
+        new_value=new_value,
     )
 
 
-def _create_tracked_event_m2m(model, instance, sender, objects, action):
+def _build_tracked_event_m2m(model, instance, sender, objects, action):
     """
-    Create the ``TrackedEvent`` and it's related ``TrackedFieldModification``
+    Build the ``TrackedEvent`` and it's related ``TrackedFieldModification``
     for a m2m modification.
     The first thing needed is to get the m2m field on the object being tracked.
     The current related objects are then taken (``old_value``).
@@ -316,12 +534,14 @@ def _create_tracked_event_m2m(model, instance, sender, objects, action):
     :param objects: The list of objects being added/removed.
     :param action: The action from the m2m_changed signal.
     """
+    events = []
     tracked_fields = []
+    plan = model._tracking_plan
     field = _get_m2m_field(model, sender)
-    if field in getattr(model, "_tracked_related_fields", {}).keys():
+    values = None
+    if field in plan.related_m2m_fields:
         # In case of a m2m tracked on a related model
-        related_fields = model._tracked_related_fields[field]
-        for related_field in related_fields:
+        for related_field in plan.related_m2m_fields[field]:
             try:
                 related_instances = getattr(instance, related_field[1])
             except ObjectDoesNotExist:
@@ -332,19 +552,36 @@ def _create_tracked_event_m2m(model, instance, sender, objects, action):
             else:
                 related_instances = [related_instances]
             for related_instance in related_instances:
-                event = _create_event(related_instance, action)
+                if values is None:
+                    values = _get_m2m_values(instance, field, objects, action)
+                event = _build_event(related_instance, action)
+                events.append(event)
                 fieldname = "{0}__{1}".format(related_field[0], field)
                 tracked_fields.append(
-                    _build_tracked_field_m2m(
-                        event, instance, field, objects, action, fieldname
-                    )
+                    _build_tracked_field_m2m(event, fieldname, values)
                 )
-    if field in getattr(model, "_tracked_fields", []):
-        event = _create_event(instance, action)
-        tracked_fields.append(
-            _build_tracked_field_m2m(event, instance, field, objects, action)
-        )
-    TrackedFieldModification.objects.bulk_create(tracked_fields)
+    if field in plan.m2m_fields:
+        if values is None:
+            values = _get_m2m_values(instance, field, objects, action)
+        event = _build_event(instance, action)
+        events.append(event)
+        tracked_fields.append(_build_tracked_field_m2m(event, field, values))
+    return events, tracked_fields
+
+
+def _get_m2m_tracked_instances(model, sender, using, **filters):
+    """
+    Get the tracked instances of a reverse m2m change with one query,
+    prefetching their current related objects and the related objects
+    tracking the m2m field.
+    """
+    field = _get_m2m_field(model, sender)
+    lookups = [field]
+    for related_field in model._tracking_plan.related_m2m_fields.get(field, ()):
+        lookups.append(related_field[1])
+    return (
+        model._default_manager.using(using).filter(**filters).prefetch_related(*lookups)
+    )
 
 
 # ======================= CALLBACKS ====================
@@ -357,31 +594,126 @@ def tracking_init(sender, instance, **kwargs):
     _set_original_fields(instance)
 
 
-def tracking_save(sender, instance, raw, using, update_fields, **kwargs):
+def tracking_save(sender, instance, created, raw, using, update_fields, **kwargs):
     """
     Post save, detect creation or changes and log them.
     We need post_save to have the object for a create.
     """
-    if _has_changed(instance):
-        if instance._original_fields["pk"] is None:
-            # Create
-            _create_create_tracking_event(instance)
-        else:
-            # Update
-            _create_update_tracking_event(instance)
-    if _has_changed_related(instance):
-        # Because an object need to be saved before being related,
-        # it can only be an update
-        _create_update_tracking_related_event(instance)
-    if _has_changed(instance) or _has_changed_related(instance):
-        _set_original_fields(instance)
+    if instance._tracking_plan.lazy:
+        _set_lazy_original_fields(instance, created)
+    changes = _get_changes(instance)
+    events, tracked_fields = _build_save_events(
+        instance, _get_fk_reprs_cache(), changes
+    )
+    _save_events(events, tracked_fields, using)
+    if instance._tracking_plan.lazy or changes.fields or changes.related:
+        _reset_original_fields(instance)
+
+
+def get_tracked_values(queryset, fields):
+    """
+    Get the values of the tracked ``fields`` of the objects of ``queryset``,
+    by primary key, without loading the objects.
+    """
+    plan = queryset.model._tracking_plan
+    snapshot_fields = [
+        (field, attname) for field, attname in plan.snapshot_fields if field in fields
+    ]
+    names = [field for field, _attname in snapshot_fields]
+    rows = queryset.order_by().values_list(
+        "pk", *(attname for _field, attname in snapshot_fields)
+    )
+    return {
+        pk: dict(zip(names, values))
+        for pk, *values in rows.iterator(chunk_size=UPDATE_CHUNK_SIZE)
+    }
+
+
+def _has_changed(original_values, values):
+    try:
+        return original_values != values
+    except TypeError:
+        # Can't compare old and new value, should be different.
+        return True
+
+
+def tracking_update(model, original_values, fields, using):
+    """
+    ``TrackingQuerySet.update`` callback.
+    The updated values are fetched again by chunks to be compared to the
+    original values, only the changed objects are loaded to build their events.
+
+    :param model: The updated model.
+    :param original_values: The values of the tracked fields before the
+        update, as returned by ``get_tracked_values``.
+    :param fields: The names of the updated fields.
+    :param using: The database alias on which the update is made.
+    """
+    manager = model._base_manager.using(using)
+    pks = list(original_values)
+    for start in range(0, len(pks), UPDATE_CHUNK_SIZE):
+        chunk = pks[start:start + UPDATE_CHUNK_SIZE]
+        values = get_tracked_values(manager.filter(pk__in=chunk), fields)
+        changed = [
+            pk
+            for pk, instance_values in values.items()
+            if _has_changed(original_values[pk], instance_values)
+        ]
+        if not changed:
+            continue
+        instances = manager.in_bulk(changed)
+        for pk, instance in instances.items():
+            instance._original_fields = original_values[pk]
+        events, tracked_fields = _build_bulk_update_events(instances.values(), fields)
+        _save_events(events, tracked_fields, using)
+
+
+def tracking_bulk_create(instances, using):
+    """
+    ``TrackingQuerySet.bulk_create`` callback.
+    Instances without primary key after the insert can not be tracked.
+    """
+    fk_reprs = _get_fk_reprs_cache()
+    events = []
+    tracked_fields = []
+    for instance in instances:
+        if instance.pk is None:
+            continue
+        if instance._tracking_plan.lazy:
+            _set_lazy_original_fields(instance, True)
+        instance_events, instance_fields = _build_save_events(instance, fk_reprs)
+        events.extend(instance_events)
+        tracked_fields.extend(instance_fields)
+        _reset_original_fields(instance)
+    _save_events(events, tracked_fields, using)
+
+
+def tracking_bulk_update(instances, fields, using):
+    """
+    ``TrackingQuerySet.bulk_update`` callback.
+    Only ``fields`` are compared to their original value, which is then reset.
+    """
+    events, tracked_fields = _build_bulk_update_events(instances, fields)
+    _save_events(events, tracked_fields, using)
+    for instance in instances:
+        original_fields = instance.__dict__.get("_original_fields", {})
+        for field, attname in instance._tracking_plan.snapshot_fields:
+            if field not in fields or field not in original_fields:
+                continue
+            if instance._tracking_plan.lazy:
+                # It will be stored again on the next write
+                del original_fields[field]
+            else:
+                original_fields[field] = getattr(instance, attname)
 
 
 def tracking_delete(sender, instance, using, **kwargs):
     """
-    Post delete callback
+    Pre delete callback.
+    Delete the objects with ``TrackingQuerySet.delete`` or in a
+    ``defer_tracking`` block to write the events in one batch.
     """
-    _create_delete_tracking_event(instance)
+    _save_events([_build_delete_tracking_event(instance)], [], using)
 
 
 def tracking_m2m(sender, instance, action, reverse, model, pk_set, using, **kwargs):
@@ -404,23 +736,32 @@ def tracking_m2m(sender, instance, action, reverse, model, pk_set, using, **kwar
             # It will actually be a remove of ``instance`` on every
             # tracked object being related
             action = "pre_remove"
-            # pk_set is None for clear events, we need to get objects' pk.
+            # pk_set is None for clear events, get the related objects.
             field = _get_m2m_field(model, sender)
-            field = model._meta.get_field(field).remote_field.get_accessor_name()
-            pk_set = set([obj.id for obj in getattr(instance, field).all()])
+            tracked_instances = _get_m2m_tracked_instances(
+                model, sender, using, **{field: instance}
+            )
+        else:
+            tracked_instances = _get_m2m_tracked_instances(
+                model, sender, using, pk__in=pk_set
+            )
         # Create an event for each object being tracked
-        for pk in pk_set:
-            tracked_instance = model.objects.get(pk=pk)
-            objects = [instance]
-            _create_tracked_event_m2m(
+        events = []
+        tracked_fields = []
+        objects = [instance]
+        for tracked_instance in tracked_instances:
+            instance_events, fields = _build_tracked_event_m2m(
                 model, tracked_instance, sender, objects, action_event[action]
             )
+            events.extend(instance_events)
+            tracked_fields.extend(fields)
     else:
         # Get the model of the object being tracked
         tracked_model = instance._meta.model
         objects = []
-        if pk_set is not None:
-            objects = [model.objects.get(pk=pk) for pk in pk_set]
-        _create_tracked_event_m2m(
+        if pk_set:
+            objects = list(model._default_manager.using(using).filter(pk__in=pk_set))
+        events, tracked_fields = _build_tracked_event_m2m(
             tracked_model, instance, sender, objects, action_event[action]
         )
+    _save_events(events, tracked_fields, using)
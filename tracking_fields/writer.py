@@ -0,0 +1,373 @@
+"""
+Write the tracking events, either right away or from background threads.
+
+The background writer is enabled with the ``TRACKING_FIELDS_ASYNC_WRITER``
+setting, a dict which can contain:
+
+- ``WORKERS``: Number of writer threads (default: 1).
+- ``BATCH_SIZE``: Maximum number of events written in one batch (default: 500).
+- ``FLUSH_INTERVAL``: Maximum number of seconds an event waits for its batch
+  to be full (default: 1).
+- ``QUEUE_SIZE``: Maximum number of saves waiting to be written (default: 10000).
+- ``BLOCK``: Whether to wait for some room in the queue when it is full. If
+  False, the events are dropped with a warning instead (default: True).
+- ``RETRIES``: Number of times a batch is written again after an error
+  (default: 3).
+- ``RETRY_DELAY``: Number of seconds to wait before the first retry, doubled
+  on each retry (default: 1).
+- ``ON_FAILURE``: Function, or its dotted path, called with the events, the
+  TrackedFieldModification and the error of a batch which could not be
+  written (default: None).
+"""
+
+from __future__ import unicode_literals
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from functools import partial
+
+from asgiref.local import Local
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    close_old_connections,
+    connections,
+    router,
+    transaction,
+)
+from django.utils.module_loading import import_string
+
+from tracking_fields.models import (
+    TrackedFieldModification,
+    TrackingContext,
+    TrackingEvent,
+)
+
+logger = logging.getLogger(__name__)
+
+# Contexts written in the current transactions, by thread and database
+_local = Local()
+
+# Sent to the workers to stop them
+_STOP = object()
+
+# Maximum number of rows inserted by query
+WRITE_BATCH_SIZE = 1000
+
+
+def bulk_write_events(events, tracked_fields):
+    """
+    Write events and their TrackedFieldModification, with one query for all
+    the events and one for all the TrackedFieldModification.
+    The primary keys being generated on creation, the events can be saved
+    in bulk even if TrackedFieldModification reference them.
+    The contexts of the events are written first, unless they have already
+    been written. They may be written at the same time by another writer.
+    Everything is written in one transaction, so a failed write can be retried.
+    """
+    if getattr(settings, "TRACKING_FIELDS_JSON_VALUES", False):
+        set_json_values(tracked_fields)
+    contexts = get_contexts(events)
+    with transaction.atomic(using=router.db_for_write(TrackingEvent), savepoint=False):
+        if contexts:
+            TrackingContext.objects.bulk_create(contexts, ignore_conflicts=True)
+            _set_contexts_written(contexts)
+        TrackingEvent.objects.bulk_create(events, batch_size=WRITE_BATCH_SIZE)
+        TrackedFieldModification.objects.bulk_create(
+            tracked_fields, batch_size=WRITE_BATCH_SIZE
+        )
+
+
+def _set_written(contexts):
+    for context in contexts:
+        context.written = True
+
+
+def _get_uncommitted_contexts(connection):
+    """
+    Get the ids of the contexts written in the savepoints of the current
+    transaction which are neither released nor rolled back, by savepoint.
+    Savepoint ids are unique on a connection but a transaction can not be
+    told apart from the previous ones, so the contexts written outside of
+    any savepoint are not remembered and are written again until committed.
+    """
+    savepoints = tuple(sid for sid in connection.savepoint_ids if sid is not None)
+    uncommitted = getattr(_local, "uncommitted", None)
+    if uncommitted is None:
+        uncommitted = _local.uncommitted = {}
+    written = [
+        (sids, pks)
+        for sids, pks in uncommitted.get(connection.alias, ())
+        if sids == savepoints[: len(sids)]
+    ]
+    uncommitted[connection.alias] = written
+    return savepoints, written
+
+
+def _set_contexts_written(contexts):
+    """
+    Remember the contexts are written. In a transaction, they are only
+    written for good once it is committed.
+    """
+    using = router.db_for_write(TrackingContext)
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        _set_written(contexts)
+        return
+    transaction.on_commit(partial(_set_written, contexts), using=using)
+    savepoints, written = _get_uncommitted_contexts(connection)
+    if savepoints:
+        written.append((savepoints, {context.pk for context in contexts}))
+
+
+def get_contexts(events):
+    """
+    Get the distinct contexts of the events which are not written yet.
+    """
+    connection = connections[router.db_for_write(TrackingContext)]
+    uncommitted = set()
+    if connection.in_atomic_block:
+        for _savepoints, pks in _get_uncommitted_contexts(connection)[1]:
+            uncommitted.update(pks)
+    contexts = {}
+    for event in events:
+        if event.context_id is None or event.context_id in contexts:
+            continue
+        if not TrackingEvent.context.is_cached(event):
+            continue
+        context = event.context
+        if not context.written and context.pk not in uncommitted:
+            contexts[event.context_id] = context
+    return list(contexts.values())
+
+
+def set_json_values(tracked_fields):
+    """
+    Copy the JSON serialized values of TrackedFieldModification to their
+    JSON fields.
+    """
+    for tracked_field in tracked_fields:
+        if tracked_field.old_value is not None:
+            tracked_field.old_value_json = json.loads(tracked_field.old_value)
+        if tracked_field.new_value is not None:
+            tracked_field.new_value_json = json.loads(tracked_field.new_value)
+
+
+class AsyncTrackingWriter:
+    """
+    Write the events from a pool of threads, each one using its own database
+    connections. Events are queued in a bounded queue and written in batches.
+    A batch which can not be written is retried, then counted in ``failed``
+    and given to ``on_failure``.
+    """
+
+    def __init__(
+        self,
+        workers=1,
+        batch_size=500,
+        flush_interval=1.0,
+        queue_size=10000,
+        block=True,
+        write=bulk_write_events,
+        retries=3,
+        retry_delay=1.0,
+        on_failure=None,
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block = block
+        self.write = write
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.on_failure = on_failure
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.failed = 0
+        self.threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._run,
+                name="tracking-fields-writer-{0}".format(i),
+                daemon=True,
+            )
+            thread.start()
+            self.threads.append(thread)
+        atexit.register(self.shutdown)
+
+    def put(self, events, tracked_fields):
+        """
+        Queue events to be written.
+
+        :return: False if the events have been dropped because the queue is full.
+        """
+        if not events:
+            return True
+        try:
+            self.queue.put((events, tracked_fields), block=self.block)
+        except queue.Full:
+            self.dropped += len(events)
+            logger.warning(
+                "Tracking writer queue is full, {0} events dropped".format(len(events))
+            )
+            return False
+        return True
+
+    def shutdown(self, timeout=None):
+        """
+        Write the queued events and stop the workers.
+        """
+        if not self.threads:
+            return
+        atexit.unregister(self.shutdown)
+        for _thread in self.threads:
+            self.queue.put(_STOP)
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def _get_batch(self):
+        """
+        Wait for events and get them until the batch is full or the flush
+        interval is elapsed.
+
+        :return: The events and TrackedFieldModification of the batch, and
+            whether the worker must stop.
+        """
+        events = []
+        tracked_fields = []
+        item = self.queue.get()
+        deadline = time.monotonic() + self.flush_interval
+        while item is not _STOP:
+            events.extend(item[0])
+            tracked_fields.extend(item[1])
+            timeout = deadline - time.monotonic()
+            if len(events) >= self.batch_size or timeout <= 0:
+                return events, tracked_fields, False
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                return events, tracked_fields, False
+        return events, tracked_fields, True
+
+    def _run(self):
+        try:
+            stop = False
+            while not stop:
+                events, tracked_fields, stop = self._get_batch()
+                if events:
+                    self._write_batch(events, tracked_fields)
+        finally:
+            connections.close_all()
+
+    def _write_batch(self, events, tracked_fields):
+        """
+        Write a batch, retrying ``retries`` times after ``retry_delay``
+        seconds, doubled on each retry.
+        """
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            close_old_connections()
+            try:
+                self.write(events, tracked_fields)
+                return
+            except Exception as e:
+                error = e
+                logger.warning(
+                    "Could not write {0} tracking events (attempt {1})".format(
+                        len(events), attempt + 1
+                    ),
+                    exc_info=True,
+                )
+        self.failed += len(events)
+        logger.error(
+            "Could not write {0} tracking events, they are lost".format(len(events)),
+            exc_info=error,
+        )
+        if self.on_failure is not None:
+            try:
+                self.on_failure(events, tracked_fields, error)
+            except Exception:
+                logger.exception("Tracking writer failure hook raised an error")
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """
+    Get the background writer, None if it is not enabled.
+    It is started on first use in each process.
+    """
+    global _writer, _writer_pid
+    config = getattr(settings, "TRACKING_FIELDS_ASYNC_WRITER", None)
+    if not config:
+        return None
+    if _writer is not None and _writer_pid == os.getpid():
+        return _writer
+    with _writer_lock:
+        if _writer is None or _writer_pid != os.getpid():
+            on_failure = config.get("ON_FAILURE")
+            if isinstance(on_failure, str):
+                on_failure = import_string(on_failure)
+            # Threads do not survive a fork, start new ones
+            _writer = AsyncTrackingWriter(
+                workers=config.get("WORKERS", 1),
+                batch_size=config.get("BATCH_SIZE", 500),
+                flush_interval=config.get("FLUSH_INTERVAL", 1.0),
+                queue_size=config.get("QUEUE_SIZE", 10000),
+                block=config.get("BLOCK", True),
+                retries=config.get("RETRIES", 3),
+                retry_delay=config.get("RETRY_DELAY", 1.0),
+                on_failure=on_failure,
+            )
+            _writer.start()
+            _writer_pid = os.getpid()
+    return _writer
+
+
+def shutdown_writer(timeout=None):
+    """
+    Write the queued events and stop the background writer.
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is not None and _writer_pid == os.getpid():
+            _writer.shutdown(timeout)
+        _writer = None
+
+
+def write_events(events, tracked_fields, using=DEFAULT_DB_ALIAS):
+    """
+    Write events, with the background writer if it is enabled.
+    The background writer writes the events outside of the transaction of the
+    tracked changes, it only gets them once this transaction is committed.
+
+    :param using: The database alias on which the tracked changes are made.
+    """
+    writer = get_writer()
+    if writer is None:
+        bulk_write_events(events, tracked_fields)
+    elif connections[using].in_atomic_block:
+        transaction.on_commit(partial(writer.put, events, tracked_fields), using=using)
+    else:
+        writer.put(events, tracked_fields)
+
+
+def _setting_changed(setting, **kwargs):
+    if setting == "TRACKING_FIELDS_ASYNC_WRITER":
+        shutdown_writer()
+
+
+setting_changed.connect(_setting_changed)